@@ -14,9 +14,12 @@ import tempfile
 import shutil
 import socket
 import signal
+import logging
+import functools
 from pathlib import Path
 from datetime import datetime
 import json
+import re
 
 # Flask imports
 try:
@@ -42,6 +45,9 @@ except ImportError:
     print("Error: Salesforce client not found!")
     sys.exit(1)
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
 app_dir = Path(__file__).parent
 app = Flask(__name__, 
             static_folder=str(app_dir / 'static'),
@@ -51,74 +57,243 @@ CORS(app)
 # Global variables
 current_analysis_result = None
 sf_client = None
+_sf_client_lock = threading.Lock()
+
+# Email domains tried when a bare login name is entered
+ACCOUNT_DOMAINS = ('novozymes.com', 'novonesis.com')
+
+# Name prefixes used by child accounts
+CHILD_PREFIXES = ('(FS)', '(EN)', '(DSS)', '(WS)', '(RH)')
+
+# 8-digit YYYYMMDD date stamp in generated output filenames
+DATE_IN_FILENAME_RE = re.compile(r'(\d{8})')
+
+# 18-character Account Id (key prefix 001), alphanumeric only
+ACCOUNT_ID_RE = re.compile(r'001[a-zA-Z0-9]{15}')
+
+# Account name -> filename-safe name: spaces to underscores, drop , . ( )
+SAFE_NAME_TABLE = str.maketrans({' ': '_', ',': None, '.': None, '(': None, ')': None})
+
+# In-process TTL caches for Salesforce lookups that rarely change in a session
+USER_ACCOUNTS_CACHE_TTL = 300
+# An empty account list is often a typo or a just-assigned owner; recheck soon
+EMPTY_ACCOUNTS_CACHE_TTL = 30
+CACHE_MAXSIZE = 512
+_cache_lock = threading.Lock()
+_user_accounts_cache = {}
+
+# Account lists are also kept on disk so a restart doesn't have to re-query them
+ACCOUNTS_DISK_CACHE_TTL = 3600
+ACCOUNTS_DISK_CACHE_FILE = Path.home() / '.b2b_insights' / 'accounts_cache.json'
+_disk_cache_lock = threading.Lock()
+
+
+def cache_get(cache, key):
+    """Return a cached value, or None if it is missing or expired."""
+    with _cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del cache[key]
+            return None
+        return value
+
+
+def cache_set(cache, key, value, ttl):
+    """Store a value for ttl seconds, evicting the oldest entry when full."""
+    with _cache_lock:
+        cache.pop(key, None)
+        if len(cache) >= CACHE_MAXSIZE:
+            del cache[next(iter(cache))]
+        cache[key] = (time.monotonic() + ttl, value)
+
+
+def accounts_disk_cache_key(username):
+    """Disk cache key: the same login can own different accounts in live and uat."""
+    environment = (os.environ.get('SALESFORCE_ENVIRONMENT') or 'live').strip().lower()
+    return f"{environment}:{username}"
+
+
+def read_accounts_disk_cache():
+    """Load the on-disk account cache, or {} if it is missing or unreadable."""
+    try:
+        return json.loads(ACCOUNTS_DISK_CACHE_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_cached_accounts(username):
+    """Accounts for username from the disk cache, or None if absent, stale or empty."""
+    entry = read_accounts_disk_cache().get(accounts_disk_cache_key(username))
+    if not entry or time.time() - entry.get('ts', 0) > ACCOUNTS_DISK_CACHE_TTL:
+        return None
+    return entry.get('accounts') or None
+
+
+def save_cached_accounts(username, accounts):
+    """Persist accounts for username, dropping expired entries; best effort."""
+    now = time.time()
+    with _disk_cache_lock:
+        cache = {
+            key: entry for key, entry in read_accounts_disk_cache().items()
+            if now - entry.get('ts', 0) <= ACCOUNTS_DISK_CACHE_TTL
+        }
+        cache[accounts_disk_cache_key(username)] = {'ts': now, 'accounts': accounts}
+        try:
+            ACCOUNTS_DISK_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = ACCOUNTS_DISK_CACHE_FILE.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(cache), encoding='utf-8')
+            os.replace(tmp_path, ACCOUNTS_DISK_CACHE_FILE)
+        except OSError as e:
+            logger.warning("Could not write account cache %s: %s", ACCOUNTS_DISK_CACHE_FILE, e)
+
+
+# Shutdown drain: seconds to wait for in-flight analyses before exiting
+SHUTDOWN_GRACE_SECONDS = 3
+_inflight_lock = threading.Lock()
+_inflight_count = 0
+_inflight_idle = threading.Event()
+_inflight_idle.set()
+_shutting_down = False
+
+
+def track_inflight(func):
+    """Count a request as in flight so shutdown can wait for it to finish."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _inflight_count
+        with _inflight_lock:
+            _inflight_count += 1
+            _inflight_idle.clear()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with _inflight_lock:
+                _inflight_count -= 1
+                if _inflight_count == 0:
+                    _inflight_idle.set()
+    return wrapper
+
+
+def handle_shutdown_signal(signum, frame):
+    """Wait briefly for in-flight requests, flush output, then exit cleanly."""
+    global _shutting_down
+    if _shutting_down:
+        # Second signal while draining: stop waiting
+        sys.exit(1)
+    _shutting_down = True
+    logger.info("Shutdown requested; waiting up to %ss for %d in-flight request(s)",
+                SHUTDOWN_GRACE_SECONDS, _inflight_count)
+    if not _inflight_idle.wait(SHUTDOWN_GRACE_SECONDS):
+        logger.warning("Shutting down with %d request(s) still running", _inflight_count)
+    logging.shutdown()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.exit(0)
 
 
 def get_salesforce_connection():
     """Get or create Salesforce connection using Azure/env credentials."""
     global sf_client
     if sf_client is None:
-        sf_client = SalesforceClient()
+        with _sf_client_lock:
+            if sf_client is None:
+                sf_client = SalesforceClient()
     return sf_client.get_connection()
 
 
+def warm_salesforce_connection():
+    """Log in ahead of the first request; failures surface again on first use."""
+    try:
+        get_salesforce_connection()
+        logger.info("Salesforce connection ready")
+    except Exception as e:
+        logger.warning("Salesforce warm-up failed (will retry on first request): %s", e)
+
+
+def call_with_reconnect(func, *args, **kwargs):
+    """Call func(sf, ...) and retry once with a fresh login if the session expired.
+
+    indicators_report queries through its module-level sf, so it is pointed at
+    the connection in use before each attempt.
+    """
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+
+    sf = get_salesforce_connection()
+    indicators_report.sf = sf
+    try:
+        return func(sf, *args, **kwargs)
+    except SalesforceExpiredSession:
+        logger.info("Salesforce session expired; logging in again")
+        with _sf_client_lock:
+            sf = sf_client.reconnect()
+        indicators_report.sf = sf
+        return func(sf, *args, **kwargs)
+
+
+@functools.lru_cache(maxsize=256)
+def username_variations(username):
+    """Full usernames to try for a login name (as given if it has a domain).
+
+    Salesforce usernames compare case-insensitively, so variations are
+    lowercased and de-duplicated (order preserved).
+    """
+    username = username.strip().lower()
+    if '@' in username:
+        return (username,)
+    return tuple(dict.fromkeys(f"{username}@{domain}" for domain in ACCOUNT_DOMAINS))
+
+
+def query_owned_accounts(sf, username):
+    """Query parent/standalone accounts owned by a user.
+
+    Usernames on the known domains are matched with a single IN query. Only
+    when that finds nothing for a bare login name is the username prefix
+    ('<user>@%') tried, for owners on other domains.
+    """
+    from simple_salesforce.format import format_soql
+
+    # Only show parent accounts (or standalone accounts) - exclude child accounts
+    # Exclude any account name starting with '(' which indicates child accounts
+    query = format_soql("""
+        SELECT Id, Name, Owner.Username
+        FROM Account
+        WHERE Owner.Username IN {}
+        AND (NOT Name LIKE '(%')
+        ORDER BY Name ASC
+    """, list(username_variations(username)))
+    records = list(sf.query_all_iter(query))
+
+    # A username that already has a domain was matched exactly above, and
+    # '<user>@<domain>@%' can never match, so skip the pattern scan
+    if not records and '@' not in username:
+        like_query = format_soql("""
+            SELECT Id, Name, Owner.Username
+            FROM Account
+            WHERE Owner.Username LIKE '{:like}@%'
+            AND (NOT Name LIKE '(%')
+            ORDER BY Name ASC
+        """, username)
+        records = list(sf.query_all_iter(like_query))
+    return records
+
+
 def query_user_accounts_from_salesforce(username):
     """Query Salesforce for accounts owned by a specific user (same logic as API endpoint)"""
     try:
-        # Set up Salesforce connection
-        sf = get_salesforce_connection()
-        
-        # Construct full email patterns to search
-        # Try both novozymes.com and novonesis.com domains
-        domains = ['novozymes.com', 'novonesis.com']
-        all_results = []
-        
-        # Try exact matches with both domains first
-        # Only show parent accounts (or standalone accounts) - exclude child accounts
-        # Exclude any account name starting with '(' which indicates child accounts
-        for domain in domains:
-            full_username = username if '@' in username else f"{username}@{domain}"
-            
-            query = f"""
-                SELECT Id, Name, Owner.Username
-                FROM Account
-                WHERE Owner.Username = '{full_username}'
-                AND (NOT Name LIKE '(%')
-                ORDER BY Name ASC
-            """
-            
-            result = sf.query_all(query)
-            
-            if len(result['records']) > 0:
-                all_results.extend(result['records'])
-        
-        # If no exact matches, use LIKE query to find accounts with username prefix
-        if len(all_results) == 0:
-            like_query = f"""
-                SELECT Id, Name, Owner.Username
-                FROM Account
-                WHERE Owner.Username LIKE '{username}@%'
-                AND (NOT Name LIKE '(%')
-                ORDER BY Name ASC
-            """
-            like_result = sf.query_all(like_query)
-            all_results.extend(like_result['records'])
+        all_results = call_with_reconnect(query_owned_accounts, username)
         
         # Process results into account list
-        accounts = []
-        for record in all_results:
-            account_name = record.get('Name', '')
-            if account_name:
-                accounts.append({
-                    'id': record['Id'],
-                    'name': account_name
-                })
-        return accounts
+        return [
+            {'id': record['Id'], 'name': record['Name']}
+            for record in all_results
+            if record.get('Name')
+        ]
         
-    except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"ERROR querying user accounts: {str(e)}")
-        print(f"ERROR details: {error_details}")
+    except Exception:
+        logger.exception("Error querying user accounts for %s", username)
         return []
 
 # HTML Templates
@@ -205,11 +380,12 @@ MAIN_TEMPLATE = """
 
     <script>
         // State management
-        // Get pre-loaded data from template (passed from server at page load)
-        let userInitials = {{ user_initials|tojson }};
+        // Initials and accounts are filled in client-side once the user clicks next
+        let userInitials = '';
         let selectedAccountId = '';
         let selectedAccountName = '';
-        let userAccounts = {{ accounts_json|safe }};
+        let userAccounts = [];
+        const FADE_FALLBACK_MS = 600;
         let isReturningUser = false;
 
         // Step 1 is always shown first; user enters initials and clicks next to load accounts
@@ -397,10 +573,12 @@ MAIN_TEMPLATE = """
         function goToStep3() {
             if (!selectedAccountId) return;
             
-            // Transition to loading state
+            // Start report generation now so the request overlaps the fade
+            const report = generateReport(selectedAccountId);
+            
+            // Transition to loading state, then act on the report once visible
             transitionTo('step2', 'step3', () => {
-                // Start report generation
-                generateReport(selectedAccountId);
+                report.then(handleReportResult);
             });
         }
 
@@ -413,15 +591,17 @@ MAIN_TEMPLATE = """
                 });
                 
                 const result = await response.json();
-                
-                if (result.success) {
-                    // Redirect directly to results
-                    window.location.href = '/results';
-                } else {
-                    // Show error state
-                    showError(selectedAccountName);
-                }
+                return Boolean(result.success);
             } catch (error) {
+                return false;
+            }
+        }
+
+        function handleReportResult(success) {
+            if (success) {
+                // Redirect directly to results
+                window.location.href = '/results';
+            } else {
                 // Show error state
                 showError(selectedAccountName);
             }
@@ -458,24 +638,38 @@ MAIN_TEMPLATE = """
         }
 
 
+        // Run done() when el's fade animation ends; the timer is only a fallback
+        // for when no animation fires (e.g. reduced motion or a hidden tab)
+        function onFadeEnd(el, done) {
+            let finished = false;
+            const finish = () => {
+                if (finished) return;
+                finished = true;
+                clearTimeout(fallback);
+                done();
+            };
+            const fallback = setTimeout(finish, FADE_FALLBACK_MS);
+            el.addEventListener('animationend', finish, { once: true });
+        }
+
         function transitionTo(fromStep, toStep, callback) {
             const from = document.getElementById(fromStep);
             const to = document.getElementById(toStep);
             
             from.classList.add('fade-out');
             
-            setTimeout(() => {
+            onFadeEnd(from, () => {
                 from.classList.add('hidden');
                 from.classList.remove('fade-out');
                 
                 to.classList.remove('hidden');
                 to.classList.add('fade-in');
                 
-                setTimeout(() => {
+                onFadeEnd(to, () => {
                     to.classList.remove('fade-in');
                     if (callback) callback();
-                }, 500);
-            }, 500);
+                });
+            });
         }
 
         // Close dropdown when clicking outside
@@ -544,16 +738,8 @@ RESULTS_TEMPLATE = """
 @app.route('/')
 def index():
     """Main page: step 1 is initials input; accounts load when user clicks next."""
-    return render_template_string(
-        MAIN_TEMPLATE,
-        user_initials="",
-        accounts_json="[]",
-        account_id="",
-        account_name="",
-        generated_time="",
-        text_report="",
-        html_report="",
-    )
+    # MAIN_TEMPLATE has no server-side placeholders, so serve it as-is
+    return MAIN_TEMPLATE
 
 @app.route('/results')
 def results():
@@ -586,9 +772,21 @@ def get_user_accounts():
         if not username:
             return jsonify({'error': 'Username is required', 'success': False}), 400
         
+        cached = cache_get(_user_accounts_cache, username)
+        if cached is None:
+            cached = load_cached_accounts(username)
+            if cached is not None:
+                cache_set(_user_accounts_cache, username, cached, USER_ACCOUNTS_CACHE_TTL)
+        if cached is not None:
+            return jsonify({
+                'success': True,
+                'accounts': cached,
+                'count': len(cached)
+            })
+        
         # Set up Salesforce connection using secure credentials
         try:
-            sf = get_salesforce_connection()
+            get_salesforce_connection()
         except ValueError as e:
             return jsonify({
                 "success": False,
@@ -600,91 +798,38 @@ def get_user_accounts():
                 "error": f"Failed to connect to Salesforce: {str(e)}",
             }), 500
 
-        # Construct full email patterns to search
-        # Try both novozymes.com and novonesis.com domains
-        domains = ['novozymes.com', 'novonesis.com']
-        all_results = []
-        
-        # Try exact matches with both domains first
-        # Only show parent accounts (or standalone accounts) - exclude child accounts
-        # Exclude any account name starting with '(' which indicates child accounts
-        for domain in domains:
-            full_username = username if '@' in username else f"{username}@{domain}"
-            
-            query = f"""
-                SELECT Id, Name, Owner.Username
-                FROM Account
-                WHERE Owner.Username = '{full_username}'
-                AND (NOT Name LIKE '(%')
-                ORDER BY Name ASC
-            """
-            
-            result = sf.query_all(query)
-            
-            if len(result['records']) > 0:
-                all_results.extend(result['records'])
-        
-        # If no exact matches, use LIKE query to find accounts with username prefix
-        # Only show parent accounts (or standalone accounts) - exclude child accounts
-        # Exclude any account name starting with '(' which indicates child accounts
-        if len(all_results) == 0:
-            # Use LIKE query to match any domain
-            like_query = f"""
-                SELECT Id, Name, Owner.Username
-                FROM Account
-                WHERE Owner.Username LIKE '{username}@%'
-                AND (NOT Name LIKE '(%')
-                ORDER BY Name ASC
-            """
-            like_result = sf.query_all(like_query)
-            all_results.extend(like_result['records'])
+        all_results = call_with_reconnect(query_owned_accounts, username)
         
         # Process accounts
         
         accounts = []
+        append_account = accounts.append
         seen_ids = set()  # Avoid duplicates
-        child_prefix_count = 0
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         
-        # Sample the first 10 to debug
-        for i, record in enumerate(all_results[:10]):
+        # Child accounts (names starting with '(') are already excluded by the query
+        for i, record in enumerate(all_results):
+            account_id = record['Id']
             account_name = record['Name']
-            is_child = record.get('MBL_Is_Child_Account__c')
-            parent_id = record.get('MBL_Custom_ParentAccountId_18__c')
             
-            print(f"\n{i+1}. {account_name}")
-            print(f"   ID: {record['Id']}")
-            print(f"   Child Flag: {is_child}")
-            print(f"   Parent ID: {parent_id}")
+            # Sample the first 10 to debug
+            if debug_enabled and i < 10:
+                logger.debug("%d. %s (ID: %s)%s", i + 1, account_name, account_id,
+                             " - HAS CHILD PREFIX!" if account_name.startswith(CHILD_PREFIXES) else "")
             
-            if account_name.startswith('(FS)') or account_name.startswith('(EN)') or account_name.startswith('(DSS)') or account_name.startswith('(WS)') or account_name.startswith('(RH)'):
-                print(f"   ⚠️  HAS CHILD PREFIX!")
-        
-        print(f"\n{'='*80}\n")
-        
-        # Now process all accounts and filter out child prefixes manually if needed
-        for record in all_results:
             # Skip duplicates
-            if record['Id'] in seen_ids:
-                continue
-            seen_ids.add(record['Id'])
-            
-            account_name = record['Name']
-            parent_id = record.get('MBL_Custom_ParentAccountId_18__c')
-            
-            # MANUAL FILTER: Skip accounts with child prefixes if they have a parent ID OR if they look like children
-            if account_name.startswith('(FS)') or account_name.startswith('(EN)') or account_name.startswith('(DSS)') or account_name.startswith('(WS)') or account_name.startswith('(RH)'):
-                print(f"FILTERING OUT (child prefix): {account_name} (Parent ID: {parent_id})")
-                child_prefix_count += 1
+            if account_id in seen_ids:
                 continue
+            seen_ids.add(account_id)
             
-            # Clean up account name
-            clean_name = account_name
-            
-            accounts.append({
-                'id': record['Id'],
-                'name': clean_name
-            })
+            append_account({'id': account_id, 'name': account_name})
         
+        if accounts:
+            cache_set(_user_accounts_cache, username, accounts, USER_ACCOUNTS_CACHE_TTL)
+            save_cached_accounts(username, accounts)
+        else:
+            # Not persisted: an empty result shouldn't outlive a restart or an hour
+            cache_set(_user_accounts_cache, username, accounts, EMPTY_ACCOUNTS_CACHE_TTL)
         
         return jsonify({
             'success': True,
@@ -693,17 +838,111 @@ def get_user_accounts():
         })
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"ERROR getting user accounts: {str(e)}")
-        print(f"ERROR details: {error_details}")
+        logger.exception("Error getting user accounts")
         return jsonify({
             'success': False,
             'error': f'Error: {str(e)}',
             'accounts': []
         }), 500
 
+@app.route('/api/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Drop cached Salesforce lookups so the next request refetches them"""
+    # Only the local UI may clear caches. CORS(app) lets any origin call the
+    # API, and a cross-site POST from the user's browser also arrives from loopback
+    origin = request.headers.get('Origin')
+    if (request.remote_addr not in ('127.0.0.1', '::1')
+            or (origin and origin.rstrip('/') != request.host_url.rstrip('/'))):
+        return jsonify({'error': 'Forbidden', 'success': False}), 403
+    with _cache_lock:
+        _user_accounts_cache.clear()
+    indicators_report.clear_lookup_caches()
+    with _disk_cache_lock:
+        try:
+            ACCOUNTS_DISK_CACHE_FILE.unlink()
+        except FileNotFoundError:
+            pass
+    return jsonify({'success': True})
+
+def run_account_analysis(sf, account_id, analysis_start, end_date):
+    """Fetch an account's data and run the combined analysis.
+
+    Returns (account_name, owner_email, analysis_result).
+    """
+    # Get account info (name and owner); memoized in indicators_report.
+    # This also validates the account before any order query is started
+    logger.info("[analyze] Salesforce connected, fetching account info")
+    account_info = indicators_report.get_account_info(account_id)
+    
+    account_name = account_info['name']
+    owner_username = account_info['owner_username']
+
+    # Clean up account name - remove (DSS) prefix if present
+    if account_name.startswith('(DSS) '):
+        account_name = account_name[6:]  # Remove "(DSS) " prefix
+
+    # Construct owner email
+    owner_email = f"{owner_username}" if owner_username else "info@microbiomelabs.com"
+
+    logger.info("Running analysis for: %s (%s)", account_name, account_id)
+
+    # Detailed account/child/parent debug; costs extra SOQL calls, so opt-in only
+    if app.debug or os.environ.get('NZOH_DEBUG_SF') == '1':
+        try:
+            from simple_salesforce.format import format_soql
+            # One round trip for the account and its children
+            debug_query = format_soql("""
+                SELECT Id, Name, MBL_Is_Child_Account__c, MBL_Custom_ParentAccountId_18__c
+                FROM Account
+                WHERE Id = {} OR MBL_Custom_ParentAccountId_18__c = {}
+            """, account_id, account_id)
+            debug_records = sf.query_all(debug_query)['records']
+            acc_record = next((r for r in debug_records if r['Id'] == account_id), None)
+            children = [r for r in debug_records if r['Id'] != account_id]
+            if acc_record is not None:
+                logger.info("   Account ID: %s", acc_record['Id'])
+                logger.info("   Account Name: %s", acc_record['Name'])
+                logger.info("   Owner: %s", owner_username or 'N/A')
+                logger.info("   MBL_Is_Child_Account__c: %s", acc_record.get('MBL_Is_Child_Account__c'))
+                logger.info("   MBL_Custom_ParentAccountId_18__c: %s", acc_record.get('MBL_Custom_ParentAccountId_18__c'))
+
+                logger.info("   Child Accounts Found: %d", len(children))
+                for child in children:
+                    logger.info("      - %s (ID: %s)", child['Name'], child['Id'])
+
+                # If this is a child account, show parent info
+                parent_id = acc_record.get('MBL_Custom_ParentAccountId_18__c')
+                if parent_id:
+                    logger.info("   THIS IS A CHILD ACCOUNT!")
+                    parent_query = format_soql("""
+                        SELECT Id, Name
+                        FROM Account
+                        WHERE Id = {}
+                    """, parent_id)
+                    parent_result = sf.query_all(parent_query)
+                    if len(parent_result['records']) > 0:
+                        parent = parent_result['records'][0]
+                        logger.info("   Parent Account: %s (%s)", parent['Name'], parent['Id'])
+        except Exception as e:
+            logger.warning("Error getting account debug info: %s", e)
+
+    # Create and run the combined analysis; it fetches the orders itself
+    # (including the MA warm-up period)
+    # Returns data in memory (no disk I/O) - eliminates path resolution issues in PyInstaller
+    analysis_result = indicators_report.create_combined_analysis(
+        account_id,
+        analysis_start,
+        end_date,
+        resolution='3D',
+        ma_window=90,
+        warmup_days=90 * 2
+    )
+    
+    return account_name, owner_email, analysis_result
+
+
 @app.route('/api/analyze', methods=['POST'])
+@track_inflight
 def analyze_account():
     """Run the indicators report analysis"""
     global current_analysis_result
@@ -711,17 +950,17 @@ def analyze_account():
     try:
         data = request.get_json()
         account_id = data.get('account_id')
-        print(f"[analyze] Starting analysis for account_id={account_id}")
+        logger.info("[analyze] Starting analysis for account_id=%s", account_id)
 
         if not account_id:
             return jsonify({'error': 'account_id is required', 'success': False}), 400
         
-        if len(account_id) != 18 or not account_id.startswith('001'):
+        if not isinstance(account_id, str) or not ACCOUNT_ID_RE.fullmatch(account_id):
             return jsonify({'error': 'Invalid account_id format', 'success': False}), 400
         
         # Set up Salesforce connection using secure credentials
         try:
-            sf = get_salesforce_connection()
+            get_salesforce_connection()
         except ValueError as e:
             return jsonify({
                 "success": False,
@@ -733,97 +972,16 @@ def analyze_account():
                 "error": f"Failed to connect to Salesforce: {str(e)}",
             }), 500
 
-        # Set the global sf variable in indicators_report module
-        indicators_report.sf = sf
-        print("[analyze] Salesforce connected, fetching account info")
-
-        # Get account info (name and owner)
-        account_info = indicators_report.get_account_info(account_id)
-        account_name = account_info['name']
-        owner_username = account_info['owner_username']
-        
-        # Clean up account name - remove (DSS) prefix if present
-        if account_name.startswith('(DSS) '):
-            account_name = account_name[6:]  # Remove "(DSS) " prefix
-        
-        # Construct owner email
-        owner_email = f"{owner_username}" if owner_username else "info@microbiomelabs.com"
-        
         # Set up analysis parameters
         from datetime import datetime, timedelta
         end_date = datetime.now()
         analysis_start = end_date - timedelta(days=365 * 5)  # 5 years of data
+        generated_time = end_date.strftime('%Y-%m-%d %H:%M:%S')
         
-        print(f"\n{'='*80}")
-        print(f"RUNNING ANALYSIS FOR: {account_name} ({account_id})")
-        print(f"{'='*80}\n")
-        
-        # Detailed debug for this account
-        try:
-            debug_query = f"""
-                SELECT Id, Name, Owner.Username, MBL_Is_Child_Account__c, MBL_Custom_ParentAccountId_18__c
-                FROM Account
-                WHERE Id = '{account_id}'
-            """
-            debug_result = sf.query_all(debug_query)
-            if len(debug_result['records']) > 0:
-                acc_record = debug_result['records'][0]
-                print(f"   Account ID: {acc_record['Id']}")
-                print(f"   Account Name: {acc_record['Name']}")
-                print(f"   Owner: {acc_record.get('Owner', {}).get('Username', 'N/A') if acc_record.get('Owner') else 'N/A'}")
-                print(f"   MBL_Is_Child_Account__c: {acc_record.get('MBL_Is_Child_Account__c')}")
-                print(f"   MBL_Custom_ParentAccountId_18__c: {acc_record.get('MBL_Custom_ParentAccountId_18__c')}")
-                
-                # Check for child accounts
-                child_query = f"""
-                    SELECT Id, Name, MBL_Is_Child_Account__c
-                    FROM Account
-                    WHERE MBL_Custom_ParentAccountId_18__c = '{account_id}'
-                """
-                child_result = sf.query_all(child_query)
-                print(f"\n   Child Accounts Found: {len(child_result['records'])}")
-                if len(child_result['records']) > 0:
-                    for child in child_result['records']:
-                        print(f"      - {child['Name']}")
-                        print(f"        ID: {child['Id']}")
-                        print(f"        Child Flag: {child.get('MBL_Is_Child_Account__c')}")
-                else:
-                    print(f"      (No child accounts)")
-                    
-                # If this is a child account, show parent info
-                parent_id = acc_record.get('MBL_Custom_ParentAccountId_18__c')
-                if parent_id:
-                    print(f"\n   ⚠️  THIS IS A CHILD ACCOUNT!")
-                    parent_query = f"""
-                        SELECT Id, Name
-                        FROM Account
-                        WHERE Id = '{parent_id}'
-                    """
-                    parent_result = sf.query_all(parent_query)
-                    if len(parent_result['records']) > 0:
-                        parent = parent_result['records'][0]
-                        print(f"   Parent Account: {parent['Name']} ({parent['Id']})")
-        except Exception as e:
-            print(f"   Error getting account debug info: {e}")
-        
-        print(f"\n{'='*80}\n")
-        
-        # Get orders and distribute FS orders
-        print("[analyze] Fetching orders from Salesforce")
-        orders = indicators_report.get_account_orders(account_id, analysis_start, end_date)
-        distributed_orders = indicators_report.distribute_monthly_orders(orders)
-        print(f"[analyze] Orders: {len(orders)} raw, {len(distributed_orders)} distributed")
-
-        # Create and run the combined analysis
-        # Returns data in memory (no disk I/O) - eliminates path resolution issues in PyInstaller
-        analysis_result = indicators_report.create_combined_analysis(
-            account_id,
-            analysis_start,
-            end_date,
-            resolution='3D',
-            ma_window=90,
-            warmup_days=90 * 2,
-            orders=distributed_orders
+        # All Salesforce work for the analysis goes through the reconnecting
+        # path, so an expired session logs in again instead of failing the request
+        account_name, owner_email, analysis_result = call_with_reconnect(
+            run_account_analysis, account_id, analysis_start, end_date
         )
         
         # Extract data from memory (no file I/O needed)
@@ -846,7 +1004,7 @@ def analyze_account():
             }), 500
         
         # Import sales dashboard functions
-        print("[analyze] Building sales dashboard HTML")
+        logger.info("[analyze] Building sales dashboard HTML")
         from sales_dashboard import parse_sales_dashboard_data, create_sales_dashboard_html
 
         # Parse the text report for dashboard data (from memory, no file read)
@@ -860,7 +1018,7 @@ def analyze_account():
             account_name, 
             dashboard_data, 
             account_id, 
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            generated_time,
             base_url,
             owner_email
         )
@@ -870,7 +1028,7 @@ def analyze_account():
             'account_id': account_id,
             'account_name': account_name,
             'owner_email': owner_email,
-            'generated_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'generated_time': generated_time,
             'html_report': sales_dashboard_html
         }
         
@@ -883,83 +1041,107 @@ def analyze_account():
         })
         
     except Exception as e:
-        import traceback
-        tb = traceback.format_exc()
-        msg = f"Error in analyze_account: {type(e).__name__}: {str(e)}"
-        print(msg, flush=True)
-        print(tb, flush=True)
-        sys.stderr.write(msg + "\n" + tb + "\n")
-        sys.stderr.flush()
+        logger.exception("Error in analyze_account")
         return jsonify({
             'success': False,
             'error': f'Server error: {str(e)}',
             'error_type': type(e).__name__,
         }), 500
 
+# Names of regular files in app_dir, refreshed when the directory changes.
+# Only names are cached: overwriting a file changes its mtime but not the
+# directory's, so mtimes are read fresh for the candidates that need them.
+_output_listing = {'mtime_ns': None, 'names': []}
+_output_listing_lock = threading.Lock()
+
+
+def list_app_dir_files():
+    """Return the names of regular files in app_dir, rescanning only on change."""
+    mtime_ns = os.stat(app_dir).st_mtime_ns
+    with _output_listing_lock:
+        if _output_listing['mtime_ns'] != mtime_ns:
+            with os.scandir(app_dir) as entries:
+                _output_listing['names'] = [entry.name for entry in entries if entry.is_file()]
+            _output_listing['mtime_ns'] = mtime_ns
+        return _output_listing['names']
+
+
+def with_mtimes(names):
+    """Pair each file name in app_dir with its current mtime, skipping removed files."""
+    files = []
+    for name in names:
+        try:
+            files.append((name, (app_dir / name).stat().st_mtime))
+        except FileNotFoundError:
+            pass
+    return files
+
+
 def find_output_files(account_name):
     """Find the most recent generated output files for an account"""
     output_files = {}
     
     # Create safe filename from account name (same logic as indicators_report.py)
-    safe_name = account_name.replace(' ', '_').replace(',', '').replace('.', '').replace('(', '').replace(')', '')
+    safe_name = account_name.translate(SAFE_NAME_TABLE)
     
     # Look for opportunity report files with pattern: {safe_name}_opportunity_report_{date}.txt
-    opportunity_pattern = f"{safe_name}_opportunity_report_*.txt"
-    chart_pattern = f"{safe_name}_opportunity_chart_*.html"
+    opportunity_prefix = f"{safe_name}_opportunity_report_"
+    chart_prefix = f"{safe_name}_opportunity_chart_"
     
-    # Find all matching files
-    opportunity_files = list(app_dir.glob(opportunity_pattern))
-    chart_files = list(app_dir.glob(chart_pattern))
+    # Find all matching files from a single directory scan
+    listing = list_app_dir_files()
+    opportunity_files = with_mtimes(name for name in listing
+                                    if name.startswith(opportunity_prefix) and name.endswith('.txt'))
+    chart_files = with_mtimes(name for name in listing
+                              if name.startswith(chart_prefix) and name.endswith('.html'))
     
     # Sort files by date in filename (most recent first), then by modification time
-    def sort_key(file_path):
-        # Extract date from filename
-        file_date = extract_date_from_filename(file_path.name)
-        if file_date:
-            # Use date from filename as primary sort key
-            return (file_date, file_path.stat().st_mtime)
-        else:
-            # Fallback to modification time
-            return (datetime.min.date(), file_path.stat().st_mtime)
+    def sort_key(item):
+        name, mtime = item
+        # Extract date from filename; fall back to modification time alone
+        file_date = extract_date_from_filename(name)
+        return (file_date or datetime.min.date(), mtime)
     
     opportunity_files.sort(key=sort_key, reverse=True)
     chart_files.sort(key=sort_key, reverse=True)
     
     # Get the most recent files
     if opportunity_files:
-        output_files['text'] = opportunity_files[0]
-        file_date = extract_date_from_filename(opportunity_files[0].name)
+        name = opportunity_files[0][0]
+        output_files['text'] = app_dir / name
+        file_date = extract_date_from_filename(name)
         if file_date:
-            print(f"Found opportunity report: {opportunity_files[0].name} (from {file_date})")
+            print(f"Found opportunity report: {name} (from {file_date})")
         else:
-            print(f"Found opportunity report: {opportunity_files[0].name}")
+            print(f"Found opportunity report: {name}")
     
     if chart_files:
-        output_files['html'] = chart_files[0]
-        file_date = extract_date_from_filename(chart_files[0].name)
+        name = chart_files[0][0]
+        output_files['html'] = app_dir / name
+        file_date = extract_date_from_filename(name)
         if file_date:
-            print(f"Found chart file: {chart_files[0].name} (from {file_date})")
+            print(f"Found chart file: {name} (from {file_date})")
         else:
-            print(f"Found chart file: {chart_files[0].name}")
+            print(f"Found chart file: {name}")
     
     # If no files found with the exact pattern, try a broader search
     if not output_files:
-        print(f"No files found with pattern {opportunity_pattern}, trying broader search...")
+        print(f"No files found with pattern {opportunity_prefix}*.txt, trying broader search...")
         
         # Look for any files containing the account name
-        for file_path in app_dir.glob(f"*{safe_name}*"):
-            if file_path.suffix == '.html':
-                output_files['html'] = file_path
-            elif file_path.suffix == '.txt':
-                output_files['text'] = file_path
+        for name in listing:
+            if safe_name in name and not name.startswith('.'):
+                if name.endswith('.html'):
+                    output_files['html'] = app_dir / name
+                elif name.endswith('.txt'):
+                    output_files['text'] = app_dir / name
     
     return output_files
 
 def extract_date_from_filename(filename):
     """Extract date from filename pattern: {name}_opportunity_report_{YYYYMMDD}.txt"""
-    import re
     # Look for 8-digit date pattern (YYYYMMDD)
-    date_match = re.search(r'(\d{8})', filename)
+    date_match = DATE_IN_FILENAME_RE.search(filename)
     if date_match:
         date_str = date_match.group(1)
         try:
@@ -997,99 +1179,122 @@ def validate_file_recency(file_path, max_age_hours=24):
     
     return is_recent
 
+def listening_sockets():
+    """Return (pid, port) for every listening inet socket, using psutil in-process"""
+    import psutil
+
+    try:
+        return [
+            (conn.pid, conn.laddr.port)
+            for conn in psutil.net_connections(kind='inet')
+            if conn.status == psutil.CONN_LISTEN
+        ]
+    except psutil.AccessDenied:
+        # macOS needs root for the system-wide table; our own processes are still visible
+        sockets = []
+        for proc in psutil.process_iter():
+            try:
+                for conn in proc.net_connections(kind='inet'):
+                    if conn.status == psutil.CONN_LISTEN:
+                        sockets.append((proc.pid, conn.laddr.port))
+            except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+        return sockets
+
 def kill_process_on_port(port):
-    """Kill any process using the specified port"""
+    """Terminate any process listening on the specified port; returns the processes signalled"""
+    import psutil
+
+    terminated = []
     try:
-        if sys.platform == "win32":
-            # Windows
-            result = subprocess.run(
-                f'netstat -ano | findstr :{port}',
-                shell=True, capture_output=True, text=True
-            )
-            if result.stdout:
-                lines = result.stdout.strip().split('\n')
-                for line in lines:
-                    if f':{port}' in line and 'LISTENING' in line:
-                        parts = line.split()
-                        if len(parts) >= 5:
-                            pid = parts[-1]
-                            try:
-                                subprocess.run(f'taskkill /PID {pid} /F', shell=True, check=True)
-                                print(f"✓ Killed process {pid} using port {port}")
-                            except subprocess.CalledProcessError:
-                                pass
-        else:
-            # macOS/Linux
-            result = subprocess.run(
-                f'lsof -ti:{port}',
-                shell=True, capture_output=True, text=True
-            )
-            if result.stdout.strip():
-                pids = result.stdout.strip().split('\n')
-                for pid in pids:
-                    try:
-                        os.kill(int(pid), signal.SIGTERM)
-                        print(f"✓ Killed process {pid} using port {port}")
-                    except (OSError, ValueError):
-                        pass
+        pids = {pid for pid, listen_port in listening_sockets()
+                if listen_port == port and pid and pid != os.getpid()}
+        for pid in pids:
+            try:
+                proc = psutil.Process(pid)
+                proc.terminate()
+                terminated.append(proc)
+                print(f"✓ Killed process {pid} using port {port}")
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
     except Exception as e:
         print(f"Warning: Could not kill processes on port {port}: {e}")
+    return terminated
+
+def port_is_free(port):
+    """Confirm a port can be bound on localhost"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(('localhost', port))
+            return True
+    except OSError:
+        return False
 
 def find_available_port(start_port=5000, max_attempts=10):
     """Find an available port starting from start_port"""
+    try:
+        occupied = {listen_port for _, listen_port in listening_sockets()}
+    except Exception:
+        occupied = set()
+    
+    # Skip ports known to be taken; a single bind confirms the candidate
     for port in range(start_port, start_port + max_attempts):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(('localhost', port))
-                return port
-        except OSError:
-            continue
+        if port not in occupied and port_is_free(port):
+            return port
     return None
 
 def setup_port(desired_port=5000):
     """Setup port by killing existing processes and finding available port"""
+    import psutil
+
     print(f"Setting up port {desired_port}...")
     
     # Try to kill any existing processes on the desired port
-    kill_process_on_port(desired_port)
+    terminated = kill_process_on_port(desired_port)
     
-    # Wait a moment for processes to die
-    time.sleep(1)
+    # Wait for them to exit (returns as soon as they do)
+    if terminated:
+        psutil.wait_procs(terminated, timeout=3)
     
     # Check if the desired port is now available
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(('localhost', desired_port))
-            print(f"✓ Port {desired_port} is available")
-            return desired_port
-    except OSError:
-        print(f"Port {desired_port} still in use, finding alternative...")
-        
-        # Find an available port
-        available_port = find_available_port(desired_port + 1)
-        if available_port:
-            print(f"✓ Using port {available_port} instead")
-            return available_port
-        else:
-            print("✗ No available ports found")
-            return None
+    if port_is_free(desired_port):
+        print(f"✓ Port {desired_port} is available")
+        return desired_port
+    
+    print(f"Port {desired_port} still in use, finding alternative...")
+    
+    # Find an available port
+    available_port = find_available_port(desired_port + 1)
+    if available_port:
+        print(f"✓ Using port {available_port} instead")
+        return available_port
+    else:
+        print("✗ No available ports found")
+        return None
 
 def check_and_install_dependencies():
     """Check and install required dependencies"""
+    # A PyInstaller build bundles its dependencies, and sys.executable is the
+    # exe itself, so "python -m pip" would just relaunch the app
+    if getattr(sys, 'frozen', False):
+        return True
+    
     print("Checking dependencies...")
     
     required_modules = [
         'pandas', 'pandas_ta_classic', 'simple_salesforce', 
-        'plotly', 'numpy', 'flask', 'flask_cors'
+        'plotly', 'numpy', 'flask', 'flask_cors', 'psutil'
     ]
     
     missing_modules = []
     
+    # find_spec only locates each module; importing pandas/plotly here would
+    # execute them at startup for nothing
+    from importlib.util import find_spec
     for module in required_modules:
-        try:
-            __import__(module.replace('-', '_'))
+        if find_spec(module.replace('-', '_')) is not None:
             print(f"✓ {module}")
-        except ImportError:
+        else:
             print(f"✗ {module} - missing")
             missing_modules.append(module)
     
@@ -1108,9 +1313,7 @@ def check_and_install_dependencies():
 
 def main():
     """Main function to start the application"""
-    print("=" * 70)
-    print("🚀 Quantitative Sales - Report Generator")
-    print("=" * 70)
+    sys.stdout.write("=" * 70 + "\n🚀 Quantitative Sales - Report Generator\n" + "=" * 70 + "\n")
     
     # Check dependencies
     if not check_and_install_dependencies():
@@ -1142,10 +1345,16 @@ def main():
             return
         host = '127.0.0.1'  # Local only when running on dev machine
     
-    print(f"\nStarting web server on {host}:{port}...")
-    print("The application will open in your browser automatically")
-    print("Press Ctrl+C to stop the server")
-    print("=" * 70)
+    sys.stdout.write(
+        f"\nStarting web server on {host}:{port}...\n"
+        "The application will open in your browser automatically\n"
+        "Press Ctrl+C to stop the server\n"
+        + "=" * 70 + "\n"
+    )
+    sys.stdout.flush()
+    
+    # Log in to Salesforce in the background so the first request doesn't wait on it
+    threading.Thread(target=warm_salesforce_connection, daemon=True).start()
     
     # Open browser after a short delay (only when running locally)
     if host == '127.0.0.1':
@@ -1155,6 +1364,10 @@ def main():
         browser_thread = threading.Thread(target=open_browser, daemon=True)
         browser_thread.start()
     
+    # Drain in-flight requests on Ctrl+C or SIGTERM (sent by kill_process_on_port)
+    signal.signal(signal.SIGINT, handle_shutdown_signal)
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+    
     # Start Flask app
     try:
         app.run(debug=False, host=host, port=port, use_reloader=False)
@@ -24,8 +24,8 @@ a = Analysis(
         'simple_salesforce',
         'plotly',
         'numpy',
-        'cryptography',
         'requests',
+        'psutil',
     ],
     hookspath=[],
     hooksconfig={},
@@ -3,15 +3,23 @@ Salesforce Client Module
 Handles Salesforce connections using environment variables (Azure App Service / Key Vault).
 """
 
-from simple_salesforce import Salesforce
-from pathlib import Path
-import sys
+import threading
 
-# Add config to path
-config_path = Path(__file__).parent.parent / "config"
-sys.path.insert(0, str(config_path))
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from env_credentials_manager import EnvCredentialsManager
+from config.env_credentials_manager import EnvCredentialsManager
+
+# Connection pool sizing for the shared HTTPS session (one Salesforce instance host)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# Transient HTTP failures (rate limiting, gateway errors) retried with backoff.
+# Only idempotent methods are retried, so logins and job creation POSTs are not.
+HTTP_RETRY_TOTAL = 3
+HTTP_RETRY_BACKOFF = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 
 class SalesforceClient:
@@ -27,6 +35,24 @@ class SalesforceClient:
             )
         self.sf = None
         self._connected = False
+        # Serializes logins so concurrent first callers share one session
+        self._lock = threading.RLock()
+
+        # Reuse one pooled HTTPS session so keep-alive sockets (and their TLS
+        # handshakes) are shared across every query made through this client.
+        # pool_block makes extra threads wait for a free socket rather than
+        # opening one-off connections that are dropped after the request.
+        self._session = requests.Session()
+        retries = Retry(
+            total=HTTP_RETRY_TOTAL,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,  # hand the last response to simple_salesforce's error handling
+        )
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                              max_retries=retries, pool_block=True)
+        self._session.mount("https://", adapter)
 
     def connect(self):
         """
@@ -38,7 +64,18 @@ class SalesforceClient:
         if self._connected and self.sf is not None:
             return self.sf
 
+        with self._lock:
+            # Another thread may have logged in while we waited
+            if self._connected and self.sf is not None:
+                return self.sf
+            return self._login()
+
+    def _login(self):
+        """Log in with env credentials and store the connection. Caller holds self._lock."""
         try:
+            # Imported on first connect so importing this module stays cheap
+            from simple_salesforce import Salesforce
+
             credentials = self.credentials_manager.get_credentials()
 
             if credentials["environment"] == "uat":
@@ -47,12 +84,14 @@ class SalesforceClient:
                     password=credentials["password"],
                     security_token=credentials["security_token"],
                     domain="test",
+                    session=self._session,
                 )
             else:
                 self.sf = Salesforce(
                     username=credentials["username"],
                     password=credentials["password"],
                     security_token=credentials["security_token"],
+                    session=self._session,
                 )
 
             self._connected = True
@@ -61,6 +100,13 @@ class SalesforceClient:
         except Exception as e:
             raise ConnectionError(f"Failed to connect to Salesforce: {str(e)}")
 
+    def reconnect(self):
+        """Drop the current session and log in again (e.g. after it expired)."""
+        with self._lock:
+            self.sf = None
+            self._connected = False
+            return self._login()
+
     def get_connection(self):
         """Get or create Salesforce connection."""
         if not self._connected:
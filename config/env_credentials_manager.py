@@ -19,15 +19,18 @@ class EnvCredentialsManager:
     """Reads Salesforce credentials from environment variables."""
 
     def __init__(self):
-        pass
+        # Snapshot the environment once; these values don't change for the process
+        self._username = (os.environ.get(ENV_USERNAME) or "").strip()
+        self._password = (os.environ.get(ENV_PASSWORD) or "").strip()
+        self._security_token = (os.environ.get(ENV_SECURITY_TOKEN) or "").strip()
+        environment = (os.environ.get(ENV_ENVIRONMENT) or "live").strip().lower()
+        self._environment = environment if environment in ("live", "uat") else "live"
+        self._user_initials = os.environ.get(ENV_USER_INITIALS)
+        self._credentials = None
 
     def is_available(self):
         """Return True if all required credential env vars are set."""
-        return bool(
-            os.environ.get(ENV_USERNAME)
-            and os.environ.get(ENV_PASSWORD)
-            and os.environ.get(ENV_SECURITY_TOKEN)
-        )
+        return bool(self._username and self._password and self._security_token)
 
     def get_credentials(self):
         """
@@ -36,26 +39,26 @@ class EnvCredentialsManager:
         Returns:
             dict with keys: username, password, security_token, environment
         """
+        if self._credentials is not None:
+            return dict(self._credentials)
         if not self.is_available():
             raise ValueError(
                 f"Environment credentials not set. Required: {ENV_USERNAME}, {ENV_PASSWORD}, {ENV_SECURITY_TOKEN}"
             )
-        environment = (os.environ.get(ENV_ENVIRONMENT) or "live").strip().lower()
-        if environment not in ("live", "uat"):
-            environment = "live"
-        return {
-            "username": os.environ[ENV_USERNAME].strip(),
-            "password": os.environ[ENV_PASSWORD].strip(),
-            "security_token": os.environ[ENV_SECURITY_TOKEN].strip(),
-            "environment": environment,
+        self._credentials = {
+            "username": self._username,
+            "password": self._password,
+            "security_token": self._security_token,
+            "environment": self._environment,
         }
+        return dict(self._credentials)
 
     def get_user_initials(self):
         """
         Return user initials when running in env-based mode (e.g. Azure).
         Uses NZOH_Q_USER_INITIALS if set; otherwise None (caller may treat as single-service identity).
         """
-        raw = os.environ.get(ENV_USER_INITIALS)
+        raw = self._user_initials
         if not raw:
             return None
         return raw.strip().upper()
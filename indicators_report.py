@@ -7,23 +7,146 @@
 
 import pandas_ta_classic as ta
 import pandas as pd
-from simple_salesforce import Salesforce, SFBulkHandler
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from plotly.subplots import make_subplots
 import plotly.express as px
 import numpy as np
+import bisect
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import os
 import sys
 import shutil
 from pathlib import Path
 
-def get_account_name(account_id):
-    query = f"""
-        SELECT Id, Name FROM Account WHERE Id = '{account_id}'
+# Per-record diagnostics go to DEBUG; run summaries are still printed
+logger = logging.getLogger(__name__)
+
+# Seconds to reuse Salesforce lookups that rarely change (account info, children)
+LOOKUP_CACHE_TTL = 600
+
+# Entries kept per memoized lookup; a long-running server sees many accounts
+LOOKUP_CACHE_MAXSIZE = 512
+
+# Product names are master data and change rarely; prices are reviewed more often
+PRODUCT_CACHE_TTL = 3600
+PRICEBOOK_CACHE_TTL = 300
+
+# Order Ids per IN list: 18-char Id plus quotes and comma, within the 20k-char WHERE limit
+ORDER_ID_BATCH_SIZE = 18000 // (18 + 3)
+
+# Product2 Ids per name-fallback query
+PRODUCT_NAME_BATCH_SIZE = 200
+
+# Worker threads for building per-product OHLCV frames
+PRODUCT_OHLCV_WORKERS = 4
+
+# Distinct input series whose pandas_ta results are kept for reuse
+INDICATOR_CACHE_SIZE = 128
+
+# Nanoseconds per day, for day arithmetic on int64 datetime views
+NS_PER_DAY = 86_400_000_000_000
+
+# Bollinger Band spectrum bar used in text reports (floor || middle || ceiling)
+BB_SPECTRUM_TEMPLATE = b'||---------------||----------------||'
+
+# RSI cut points and the ordering-openness label for each band between them
+RSI_TREND_THRESHOLDS = (30, 40, 45, 50)
+RSI_TREND_LABELS = (
+    "Very open to ordering",
+    "Open to ordering",
+    "Neutral",
+    "Resistant to ordering",
+    "Strongly resistant to ordering",
+)
+
+# Bollinger Band fields an opportunity needs for order recommendations
+OPPORTUNITY_BB_FIELDS = ('bb_lower', 'bb_middle', 'bb_upper')
+
+# Report resolution -> pandas grouping frequency
+RESOLUTION_FREQ = {
+    '3D': '3D',
+    '1W': 'W',
+    '2W': '2W',
+    '1M': 'M'
+}
+
+# Candle length per resolution (candles run period_start..period_end). Candle
+# groupers use label='left', closed='left' so weekly bins are labelled by their
+# first day like '3D' ones. Calendar months have no fixed length, so '1M'
+# candles are not supported.
+RESOLUTION_STEP = {
+    '3D': pd.Timedelta(days=3),
+    '1W': pd.Timedelta(weeks=1),
+    '2W': pd.Timedelta(weeks=2)
+}
+
+_memoized_lookups = []
+
+def ttl_memoize(ttl=LOOKUP_CACHE_TTL, cache_empty=True, key=None, maxsize=LOOKUP_CACHE_MAXSIZE):
     """
-    account = sf.query_all(query)
-    account_name = account['records'][0]['Name']
+    Memoize a Salesforce lookup for ttl seconds, keyed on its positional args
+    (lists are keyed as tuples) or on key(*args) when given. With
+    cache_empty=False, empty results -- which the lookups also return on
+    errors -- are not cached. At most maxsize entries are kept: when full,
+    expired entries are dropped first, then the oldest.
+    """
+    def decorator(func):
+        cache = {}
+        lock = threading.Lock()
+        make_key = key or (lambda *args: tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args))
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            cache_key = make_key(*args)
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(cache_key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            value = func(*args)
+            if value or cache_empty:
+                with lock:
+                    cache.pop(cache_key, None)
+                    if len(cache) >= maxsize:
+                        for expired_key in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+                            del cache[expired_key]
+                    if len(cache) >= maxsize:
+                        del cache[next(iter(cache))]
+                    cache[cache_key] = (now + ttl, value)
+            return value
+
+        wrapper.cache_clear = cache.clear
+        _memoized_lookups.append(wrapper)
+        return wrapper
+    return decorator
+
+def clear_lookup_caches():
+    """Drop all memoized Salesforce lookups"""
+    for lookup in _memoized_lookups:
+        lookup.cache_clear()
+
+@functools.lru_cache(maxsize=INDICATOR_CACHE_SIZE)
+def _run_indicator(name, values_bytes, params):
+    return getattr(ta, name)(pd.Series(np.frombuffer(values_bytes)), **dict(params))
+
+def cached_indicator(name, series, **params):
+    """
+    Run ta.<name> on a series, reusing the result when the same values and
+    parameters were seen before (re-runs of a report, repeated product series)
+    """
+    values = series.to_numpy(dtype=np.float64)
+    result = _run_indicator(name, values.tobytes(), tuple(sorted(params.items())))
+    if result is None:
+        return None
+    return result.set_axis(series.index)
+
+def get_account_name(account_id):
+    account_name = get_account_info(account_id)['name']
     
     # Clean up account name - remove (DSS) prefix if present
     if account_name.startswith('(DSS) '):
@@ -31,14 +154,17 @@ def get_account_name(account_id):
     
     return account_name
 
+@ttl_memoize()
 def get_account_info(account_id):
     """
     Get account name and owner username
     Returns dict with 'name' and 'owner_username' keys
     """
-    query = f"""
-        SELECT Id, Name, Owner.Username FROM Account WHERE Id = '{account_id}'
-    """
+    from simple_salesforce.format import format_soql
+    
+    query = format_soql("""
+        SELECT Id, Name, Owner.Username FROM Account WHERE Id = {}
+    """, account_id)
     account = sf.query_all(query)
     record = account['records'][0]
     
@@ -51,30 +177,40 @@ def get_account_info(account_id):
         'owner_username': owner_username
     }
 
+@ttl_memoize(cache_empty=False)
 def get_child_accounts(parent_account_id):
     """
     Find all child accounts that have this account as their parent.
     Uses MBL_Custom_ParentAccountId_18__c to find child accounts.
     """
-    query = f"""
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+    
+    query = format_soql("""
         SELECT 
             Id, 
             Name, 
             MBL_Is_Child_Account__c 
         FROM Account 
-        WHERE MBL_Custom_ParentAccountId_18__c = '{parent_account_id}'
+        WHERE MBL_Custom_ParentAccountId_18__c = {}
         AND MBL_Is_Child_Account__c = true
-    """
+    """, parent_account_id)
     
     try:
         child_accounts = sf.query_all(query)
         print(f"Found {len(child_accounts['records'])} child accounts")
         return child_accounts['records']
+    except SalesforceExpiredSession:
+        # Let the caller log in again rather than reporting no data
+        raise
     except Exception as e:
         print(f"Error fetching child accounts: {str(e)}")
         return []
 
 def get_account_orders(account_id, start_date=None, end_date=None):
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+    
     # Get child accounts first
     child_accounts = get_child_accounts(account_id)
     all_account_ids = [account_id] + [acc['Id'] for acc in child_accounts]
@@ -82,12 +218,12 @@ def get_account_orders(account_id, start_date=None, end_date=None):
     # Build date filter if dates are provided
     date_filter = ""
     if start_date:
-        date_filter += f" AND MBL_Order_Shipped_Time__c >= {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND MBL_Order_Shipped_Time__c >= {:literal}", start_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     if end_date:
-        date_filter += f" AND MBL_Order_Shipped_Time__c <= {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND MBL_Order_Shipped_Time__c <= {:literal}", end_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     
     # Create account ID filter
-    account_filter = "AccountId IN ('" + "','".join(all_account_ids) + "')"
+    account_filter = format_soql("AccountId IN {}", all_account_ids)
     
     # Modify query to include Account.Name
     query = f"""
@@ -95,10 +231,9 @@ def get_account_orders(account_id, start_date=None, end_date=None):
             Id, 
             MBL_Order_Shipped_Time__c, 
             TotalAmount, 
-            MBL_Total_Number_of_Products__c,
             AccountId,
             Account.Name,
-            Type
+            (SELECT Quantity, TotalPrice, UnitPrice FROM OrderItems)
         FROM Order 
         WHERE {account_filter}
         {date_filter}
@@ -108,10 +243,6 @@ def get_account_orders(account_id, start_date=None, end_date=None):
     try:
         orders = sf.query_all(query)
         
-        # Print summary of orders found
-        print(f"\nOrder Summary:")
-        print(f"Total orders found: {len(orders['records'])}")
-        
         # Group orders by account
         orders_by_account = {}
         for order in orders['records']:
@@ -121,130 +252,123 @@ def get_account_orders(account_id, start_date=None, end_date=None):
                 orders_by_account[acc_id] = {'name': acc_name, 'count': 0}
             orders_by_account[acc_id]['count'] += 1
         
-        # Print breakdown
-        for acc_id, info in orders_by_account.items():
-            print(f"  {info['name']}: {info['count']} orders")
+        # Print summary of orders found with the per-account breakdown in one write
+        summary = [f"\nOrder Summary:", f"Total orders found: {len(orders['records'])}"]
+        summary.extend(f"  {info['name']}: {info['count']} orders" for info in orders_by_account.values())
+        print("\n".join(summary))
             
         return orders['records']
         
+    except SalesforceExpiredSession:
+        # Let the caller log in again rather than reporting no data
+        raise
     except Exception as e:
         print(f"Error fetching orders: {str(e)}")
         return []
 
+def get_nested_order_quantities(orders):
+    """
+    Build the get_order_quantities mapping from the OrderItems subquery that
+    get_account_orders returns inline. Returns (order_data, missing_ids) where
+    missing_ids are orders whose nested items were truncated and need a lookup.
+    """
+    order_data = {}
+    missing_ids = []
+    for order in orders:
+        if 'OrderItems' not in order:
+            missing_ids.append(order['Id'])
+            continue
+        items = order['OrderItems']
+        if not items:
+            continue  # No line items: same as no row from the aggregate query
+        if not items.get('done', True):
+            missing_ids.append(order['Id'])
+            continue
+        records = items['records']
+        if not records:
+            continue
+        unit_prices = [float(r['UnitPrice']) for r in records if r.get('UnitPrice') is not None]
+        order_data[order['Id']] = {
+            'quantity': float(sum(r.get('Quantity') or 0 for r in records)),
+            'total_price': float(sum(r.get('TotalPrice') or 0 for r in records)),
+            'unit_price': sum(unit_prices) / len(unit_prices) if unit_prices else 0.0
+        }
+    return order_data, missing_ids
+
 def get_order_quantities(order_ids):
     """
-    Get total quantities and prices from OrderItems for given Order IDs using Bulk API
+    Get total quantities and prices from OrderItems for given Order IDs
     Returns a dictionary with quantity and price information
     """
     if not order_ids:
         return {}
     
-    # Update query to include price information
-    query = """
-        SELECT 
-            OrderId, 
-            SUM(Quantity) total_quantity,
-            SUM(TotalPrice) total_price,
-            AVG(UnitPrice) avg_unit_price
-        FROM OrderItem 
-        WHERE OrderId IN ('{}')
-        GROUP BY OrderId
-    """.format("','".join(order_ids))
-    
-    try:
-        # Execute bulk query using sf.bulk
-        job = sf.bulk.OrderItem.query(query)
-        results = list(job)
-        
-        # Create dictionary mapping Order ID to quantity and price info
-        order_data = {
-            record['OrderId']: {
+    from simple_salesforce.format import format_soql
+    
+    # Aggregate server-side, one REST query per batch; keep each IN list
+    # under SOQL's 20k-character WHERE limit
+    order_data = {}
+    
+    for i in range(0, len(order_ids), ORDER_ID_BATCH_SIZE):
+        batch_ids = order_ids[i:i + ORDER_ID_BATCH_SIZE]
+        query = format_soql("""
+            SELECT 
+                OrderId, 
+                SUM(Quantity) total_quantity,
+                SUM(TotalPrice) total_price,
+                AVG(UnitPrice) avg_unit_price
+            FROM OrderItem 
+            WHERE OrderId IN {}
+            GROUP BY OrderId
+        """, batch_ids)
+        
+        for record in sf.query_all_iter(query):
+            order_data[record['OrderId']] = {
                 'quantity': float(record['total_quantity']),
                 'total_price': float(record['total_price']),
                 'unit_price': float(record['avg_unit_price'])
             }
-            for record in results
-        }
-        
-        return order_data
-        
-    except Exception as e:
-        print(f"Bulk API Error: {str(e)}")
-        print("Falling back to regular query with batched IDs...")
-        
-        # Fallback: Process in smaller batches
-        batch_size = 100
-        order_data = {}
-        
-        for i in range(0, len(order_ids), batch_size):
-            batch_ids = order_ids[i:i + batch_size]
-            order_id_string = "','".join(batch_ids)
-            
-            query = f"""
-                SELECT 
-                    OrderId, 
-                    SUM(Quantity) total_quantity,
-                    SUM(TotalPrice) total_price,
-                    AVG(UnitPrice) avg_unit_price
-                FROM OrderItem 
-                WHERE OrderId IN ('{order_id_string}')
-                GROUP BY OrderId
-            """
-            
-            batch_results = sf.query_all(query)
-            batch_data = {
-                record['OrderId']: {
-                    'quantity': float(record['total_quantity']),
-                    'total_price': float(record['total_price']),
-                    'unit_price': float(record['avg_unit_price'])
-                }
-                for record in batch_results['records']
-            }
-            order_data.update(batch_data)
-        
-        return order_data
+    
+    return order_data
 
-def create_ohlcv_from_orders(orders, resolution='1M', ma_window=90):
+def create_ohlcv_from_orders(orders, resolution='3D', ma_window=90):
     """
     Create OHLCV DataFrame showing how orders influence the quarterly moving average
     
     Parameters:
     - orders: Salesforce order records
-    - resolution: Time period grouping ('3D', '1W', '2W', '1M')
+    - resolution: Time period grouping ('3D', '1W', '2W')
     - ma_window: Moving average window in days (default 90 for quarterly)
     """
-    freq_map = {
-        '3D': '3D',
-        '1W': 'W',
-        '2W': '2W',
-        '1M': 'M'
-    }
-    freq = freq_map[resolution]
+    freq = RESOLUTION_FREQ[resolution]
+    if resolution not in RESOLUTION_STEP:
+        raise ValueError(f"Unsupported candle resolution: {resolution}")
 
-    # Get order IDs and their quantities/prices
-    order_ids = [order['Id'] for order in orders]
-    order_data = get_order_quantities(order_ids)
+    # Get order quantities/prices from the inline OrderItems subquery; only
+    # orders without (complete) nested items need a separate lookup
+    order_data, missing_ids = get_nested_order_quantities(orders)
+    if missing_ids:
+        order_data.update(get_order_quantities(list(dict.fromkeys(missing_ids))))
     
     # Convert orders to DataFrame and sort by date
     df = pd.DataFrame(orders)
     df['MBL_Order_Shipped_Time__c'] = pd.to_datetime(df['MBL_Order_Shipped_Time__c'])
     df['TotalAmount'] = pd.to_numeric(df['TotalAmount'])
     
-    # Add quantities and prices to DataFrame
-    df['volume'] = df['Id'].map(lambda x: order_data.get(x, {}).get('quantity', 0))
-    df['unit_price'] = df['Id'].map(lambda x: order_data.get(x, {}).get('unit_price', 0))
-    df['volume'] = df['volume'].fillna(0)
-    df['unit_price'] = df['unit_price'].fillna(0)
+    # Add quantities and prices to DataFrame (orders without items get 0)
+    quantities = pd.Series({order_id: data['quantity'] for order_id, data in order_data.items()}, dtype=float)
+    unit_prices = pd.Series({order_id: data['unit_price'] for order_id, data in order_data.items()}, dtype=float)
+    df['volume'] = df['Id'].map(quantities).fillna(0)
+    df['unit_price'] = df['Id'].map(unit_prices).fillna(0)
     
     df = df.sort_values('MBL_Order_Shipped_Time__c')
     
     # Calculate daily cumulative account value
     daily_df = df.set_index('MBL_Order_Shipped_Time__c')
+    # Only TotalAmount feeds the MA; empty days sum to 0 so no fill is needed
     daily_df = daily_df.resample('D').agg({
-        'TotalAmount': 'sum',
-        'volume': 'sum',
-        'unit_price': 'mean'  # Take mean of unit price for the day
-    }).ffill()  # Forward fill unit prices
+        'TotalAmount': 'sum'
+    })
     
     # Calculate simple MA without normalization
     daily_df['MA'] = daily_df['TotalAmount'].rolling(
@@ -261,74 +385,54 @@ def create_ohlcv_from_orders(orders, resolution='1M', ma_window=90):
     print(f"\nFirst valid MA date: {first_valid_ma.date()}")
     
     # Group by specified frequency for candlesticks
-    grouped = df.groupby(pd.Grouper(key='MBL_Order_Shipped_Time__c', freq=freq)).agg({
-        'TotalAmount': list,
-        'volume': 'sum',
-        'unit_price': 'mean'  # Take mean of unit price for the period
-    })
+    grouped = df.groupby(pd.Grouper(key='MBL_Order_Shipped_Time__c', freq=freq, label='left', closed='left')).agg(
+        order_count=('TotalAmount', 'size'),
+        volume=('volume', 'sum'),
+        unit_price=('unit_price', 'mean')  # Take mean of unit price for the period
+    )
     
     # Initialize OHLCV DataFrame
     ohlcv = pd.DataFrame(index=grouped.index)
     ohlcv['volume'] = grouped['volume']
     ohlcv['unit_price'] = grouped['unit_price'].ffill()  # Forward fill unit prices
     
-    # Initialize is_live column (marks current open candle)
-    ohlcv['is_live'] = False
-    
     # Get the last available date with data
     last_data_date = daily_df.index[-1]
+    ma = daily_df['MA']
+    
+    # Each candle covers period_start..period_end inclusive, clipped to today for
+    # the live candle. daily_df has one row per day, so a reversed rolling window
+    # of step + 1 rows yields every candle's high/low in a single pass.
+    step = RESOLUTION_STEP[resolution]
+    reversed_ma = ma.iloc[::-1].rolling(step.days + 1, min_periods=1)
+    window_high = reversed_ma.max().iloc[::-1]
+    window_low = reversed_ma.min().iloc[::-1]
+    
+    period_starts = ohlcv.index
+    period_ends = period_starts + step
+    ma_start = ma.reindex(period_starts).to_numpy()
+    ma_end = ma.reindex(period_ends).to_numpy()
+    
+    # Current/open candle: period extends beyond available data
+    is_live = period_ends > last_data_date
+    in_range = (period_starts >= first_valid_ma) & period_starts.isin(daily_df.index)
+    live = in_range & is_live
+    closed = (
+        in_range & ~is_live
+        & (period_ends <= ma.last_valid_index())
+        & (grouped['order_count'].to_numpy() > 0)
+    )
     
-    # Process periods including current open candle
-    for idx in grouped.index:
-        if idx < first_valid_ma:
-            continue
-            
-        period_start = idx
-        period_end = idx + pd.Timedelta(freq)
-        
-        # Check if this is the current/open candle (period extends beyond available data)
-        is_current_candle = period_end > last_data_date
-        
-        if is_current_candle:
-            # LIVE CANDLE: Use current data through today
-            print(f"  📊 Including LIVE candle: {period_start.date()} - {period_end.date()} (current through {last_data_date.date()})")
-            
-            # Get all MA data from period start through today
-            period_ma = daily_df.loc[period_start:last_data_date, 'MA']
-            
-            if len(period_ma) == 0 or period_start not in daily_df.index:
-                continue
-            
-            ma_start = daily_df.loc[period_start, 'MA']
-            ma_current = daily_df['MA'].iloc[-1]  # Current MA value (today)
-            
-            # Set OHLC values using live data
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_current  # Live close value
-            ohlcv.at[idx, 'high'] = period_ma.max()
-            ohlcv.at[idx, 'low'] = period_ma.min()
-            ohlcv.at[idx, 'is_live'] = True
-            
-        else:
-            # CLOSED CANDLE: Use complete period data
-            if period_end > daily_df['MA'].last_valid_index():
-                continue
-                
-            period_orders = grouped.at[idx, 'TotalAmount']
-            if not isinstance(period_orders, list) or len(period_orders) == 0:
-                continue
-            
-            # Get MA values for closed candle
-            ma_start = daily_df.loc[period_start, 'MA']
-            ma_end = daily_df.loc[period_end, 'MA'] if period_end in daily_df.index else ma_start
-            
-            # Set OHLC values
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_end
-            period_ma = daily_df.loc[period_start:period_end, 'MA']
-            ohlcv.at[idx, 'high'] = period_ma.max()
-            ohlcv.at[idx, 'low'] = period_ma.min()
-            ohlcv.at[idx, 'is_live'] = False
+    for period_start, period_end in zip(period_starts[live], period_ends[live]):
+        print(f"  📊 Including LIVE candle: {period_start.date()} - {period_end.date()} (current through {last_data_date.date()})")
+    
+    # Set OHLC values; live candles close on the current MA value (today)
+    ohlcv['is_live'] = live
+    ohlcv['open'] = ma_start
+    ohlcv['close'] = np.where(live, ma.iloc[-1], np.where(period_ends.isin(daily_df.index), ma_end, ma_start))
+    ohlcv['high'] = window_high.reindex(period_starts).to_numpy()
+    ohlcv['low'] = window_low.reindex(period_starts).to_numpy()
+    ohlcv = ohlcv[live | closed]
     
     # Remove any periods without valid data
     ohlcv = ohlcv.dropna(subset=['open', 'close', 'high', 'low'])
@@ -365,8 +469,8 @@ def calculate_indicators(df, MA_length=20):
     # Add indicator columns only if we have enough data
     if len(df) >= MA_length:
         try:
-            df[f'sma_{MA_length}'] = ta.sma(df['close'], length=MA_length)
-            df[f'ema_{MA_length}'] = ta.ema(df['close'], length=MA_length)
+            df[f'sma_{MA_length}'] = cached_indicator('sma', df['close'], length=MA_length)
+            df[f'ema_{MA_length}'] = cached_indicator('ema', df['close'], length=MA_length)
         except Exception as e:
             print(f"Warning: Could not calculate MA indicators: {str(e)}")
     
@@ -374,7 +478,7 @@ def calculate_indicators(df, MA_length=20):
     if len(df) >= 20:
         try:
             # Match simple_report_app exactly: use std=2.0 parameter
-            bbands = ta.bbands(df['close'], length=20, std=2.0)
+            bbands = cached_indicator('bbands', df['close'], length=20, std=2.0)
             if bbands is not None and not bbands.empty:
                 # pandas_ta 0.3.14b0 returns columns with _2.0_2.0 suffix when std=2.0 is used
                 # Try the expected column names first, then fall back to actual returned names
@@ -408,13 +512,20 @@ def calculate_indicators(df, MA_length=20):
                 
                 # Get the last 90 periods for simulation
                 close_values = df['close'].iloc[-90:].values
-                current_ma = np.mean(close_values)
                 
-                # Function to simulate next period's MA only
-                def simulate_next_period(values):
-                    new_values = np.append(values[1:], 0)  # Remove oldest, add 0
-                    new_ma = np.mean(new_values)
-                    return new_values, new_ma
+                # MA after k zero-order periods is sum(close_values[k:]) / n, so one
+                # reversed cumsum gives every decayed MA at once (0 once all values are gone)
+                max_periods = 90  # Maximum 90 3-day periods
+                n_values = len(close_values)
+                tail_sums = close_values[::-1].cumsum()[::-1]
+                decayed_mas = np.zeros(max_periods)
+                steps = min(n_values - 1, max_periods)
+                decayed_mas[:steps] = tail_sums[1:steps + 1] / n_values
+                
+                def periods_until(band):
+                    # Index of the first decayed MA at or below the band, else max_periods
+                    hits = np.flatnonzero(decayed_mas <= band)
+                    return int(hits[0]) if hits.size else max_periods
                 
                 # Initialize simulation results
                 df['days_until_lower_breach'] = 0
@@ -422,31 +533,11 @@ def calculate_indicators(df, MA_length=20):
                 
                 # Simulate for lower band if above it
                 if latest_close > latest_bb_lower:
-                    simulation_values = close_values.copy()
-                    periods = 0
-                    max_periods = 90  # Maximum 90 3-day periods
-                    
-                    while periods < max_periods:
-                        simulation_values, new_ma = simulate_next_period(simulation_values)
-                        if new_ma <= latest_bb_lower:
-                            break
-                        periods += 1
-                    
-                    df['days_until_lower_breach'] = periods * 3  # Convert to days
+                    df['days_until_lower_breach'] = periods_until(latest_bb_lower) * 3  # Convert to days
                 
                 # Simulate for middle band if above it
                 if latest_close > latest_bb_middle:
-                    simulation_values = close_values.copy()
-                    periods = 0
-                    max_periods = 90  # Maximum 90 3-day periods
-                    
-                    while periods < max_periods:
-                        simulation_values, new_ma = simulate_next_period(simulation_values)
-                        if new_ma <= latest_bb_middle:
-                            break
-                        periods += 1
-                    
-                    df['days_until_middle_breach'] = periods * 3  # Convert to days
+                    df['days_until_middle_breach'] = periods_until(latest_bb_middle) * 3  # Convert to days
             elif bbands is None:
                 print(f"Debug: ta.bbands() returned None for {len(df)} data points")
             elif bbands.empty:
@@ -459,16 +550,16 @@ def calculate_indicators(df, MA_length=20):
     # RSI - requires at least 14 points
     if len(df) >= 14:
         try:
-            df['rsi'] = ta.rsi(df['close'], length=14)
+            df['rsi'] = cached_indicator('rsi', df['close'], length=14)
             if len(df) >= 28:  # Need at least 28 points for RSI MA
-                df['rsi_ma'] = ta.sma(df['rsi'], length=14)
+                df['rsi_ma'] = cached_indicator('sma', df['rsi'], length=14)
         except Exception as e:
             print(f"Warning: Could not calculate RSI: {str(e)}")
     
     # MACD - requires at least 26 points
     if len(df) >= 26:
         try:
-            macd = ta.macd(df['close'])
+            macd = cached_indicator('macd', df['close'])
             if macd is not None:
                 df['macd'] = macd['MACD_12_26_9']
                 df['macd_signal'] = macd['MACDs_12_26_9']
@@ -485,17 +576,19 @@ def get_account_order_products(account_id, start_date=None, end_date=None):
     """
     Get OrderItem records with product details for an account with cascading product name fallbacks
     """
+    from simple_salesforce.format import format_soql
+    
     date_filter = ""
     if start_date:
-        date_filter += f" AND Order.MBL_Order_Shipped_Time__c >= {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND Order.MBL_Order_Shipped_Time__c >= {:literal}", start_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     if end_date:
-        date_filter += f" AND Order.MBL_Order_Shipped_Time__c <= {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND Order.MBL_Order_Shipped_Time__c <= {:literal}", end_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    
+    account_filter = format_soql("Order.AccountId = {}", account_id)
     
     query = f"""
         SELECT 
-            Id,
             Order.MBL_Order_Shipped_Time__c,
-            Order.TotalAmount,
             Product2Id,
             Product_Name__c,
             Product2.Name,
@@ -504,70 +597,81 @@ def get_account_order_products(account_id, start_date=None, end_date=None):
             TotalPrice,
             UnitPrice
         FROM OrderItem 
-        WHERE Order.AccountId = '{account_id}'
+        WHERE {account_filter}
         {date_filter}
         ORDER BY Order.MBL_Order_Shipped_Time__c ASC
     """
     order_products = sf.query_all(query)
     
-    # Apply cascading product name fallback logic to each record
+    # Apply cascading product name fallback logic to each record. Items of the
+    # same product repeat the same name fields, so each distinct combination is
+    # resolved (and reported) once.
+    resolved_names = {}
     for record in order_products['records']:
-        product_name = (record.get('Product_Name__c') or '').strip()
-        product2_name = ''
-        product2_code = ''
-        
-        if record.get('Product2'):
-            product2_name = (record['Product2'].get('Name') or '').strip()
-            product2_code = (record['Product2'].get('ProductCode') or '').strip()
-        
-        # Use Product_Name__c if available and non-empty
-        if product_name:
-            final_name = product_name
-        # Otherwise try Product2.Name
-        elif product2_name:
-            final_name = product2_name
-            print(f"  ℹ Using Product2.Name for Product2Id {record['Product2Id']}: {final_name}")
-        # Last resort: use ProductCode
-        elif product2_code:
-            final_name = product2_code
-            print(f"  ⚠ Using ProductCode for Product2Id {record['Product2Id']}: {final_name}")
-        else:
-            final_name = f"Unknown Product ({record['Product2Id']})"
-            print(f"  ✗ No name found for Product2Id {record['Product2Id']}")
+        product2 = record.get('Product2') or {}
+        name_fields = (record['Product2Id'], record.get('Product_Name__c'),
+                       product2.get('Name'), product2.get('ProductCode'))
+        final_name = resolved_names.get(name_fields)
+        
+        if final_name is None:
+            product_id = name_fields[0]
+            product_name, product2_name, product2_code = ((value or '').strip() for value in name_fields[1:])
+            
+            # Use Product_Name__c if available and non-empty
+            if product_name:
+                final_name = product_name
+            # Otherwise try Product2.Name
+            elif product2_name:
+                final_name = product2_name
+                logger.debug("Using Product2.Name for Product2Id %s: %s", product_id, final_name)
+            # Last resort: use ProductCode
+            elif product2_code:
+                final_name = product2_code
+                logger.debug("Using ProductCode for Product2Id %s: %s", product_id, final_name)
+            else:
+                final_name = f"Unknown Product ({product_id})"
+                logger.debug("No name found for Product2Id %s", product_id)
+            resolved_names[name_fields] = final_name
         
         # Update the record with the final name
         record['Product_Name__c'] = final_name
     
     return order_products['records']
 
-def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=90, pricebook_prices=None):
+def index_order_products(order_products):
+    """
+    Flatten OrderItem records into one DataFrame and split it by Product2Id
+    Returns dict mapping Product2Id to a DataFrame with date, TotalPrice, Quantity and UnitPrice columns
+    """
+    if not order_products:
+        return {}
+    
+    # Pull the nested Order fields out in one pass instead of once per product
+    df = pd.DataFrame({
+        'Product2Id': [item['Product2Id'] for item in order_products],
+        'date': pd.to_datetime([item['Order']['MBL_Order_Shipped_Time__c'] for item in order_products]),
+        'TotalPrice': pd.to_numeric([item['TotalPrice'] for item in order_products]),
+        'Quantity': pd.to_numeric([item['Quantity'] for item in order_products]),
+        'UnitPrice': [item['UnitPrice'] for item in order_products],
+    })
+    
+    return {product_id: group for product_id, group in df.groupby('Product2Id', sort=False)}
+
+def create_product_ohlcv(product_frame, product_id, resolution='3D', ma_window=90, pricebook_prices=None):
     """
     Create OHLCV DataFrame for a specific product
     
     Args:
-        order_products: List of OrderItem records
-        product_id: Product2Id to filter for
-        resolution: Time period grouping ('3D', '1W', '2W', '1M')
+        product_frame: The product's order items, as returned by index_order_products
+        product_id: Product2Id of the product
+        resolution: Time period grouping ('3D', '1W', '2W')
         ma_window: Moving average window in days
         pricebook_prices: Dict mapping Product2Id to current pricebook unit price (optional)
     """
-    # Filter for specific product
-    product_orders = [
-        order for order in order_products 
-        if order['Product2Id'] == product_id
-    ]
-    
-    if not product_orders:
+    if product_frame is None or product_frame.empty:
         return None
     
-    # Convert to DataFrame
-    df = pd.DataFrame(product_orders)
-    
-    # Extract nested Order fields
-    df['date'] = pd.to_datetime([order['Order']['MBL_Order_Shipped_Time__c'] for order in product_orders])
-    df['OrderTotalAmount'] = [order['Order']['TotalAmount'] for order in product_orders]
-    df['TotalPrice'] = pd.to_numeric(df['TotalPrice'])
-    df['Quantity'] = pd.to_numeric(df['Quantity'])
+    df = product_frame.copy()
     
     # Determine unit price to use
     if pricebook_prices and product_id in pricebook_prices:
@@ -587,9 +691,9 @@ def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=
     # Resample to daily and fill gaps
     daily_df = df.set_index('date').resample('D').agg({
         'TotalPrice': 'sum',
-        'Quantity': 'sum',
         'UnitPrice': 'mean'  # Keep consistent unit price
-    }).ffill()  # Forward fill unit prices
+    })
+    daily_df['UnitPrice'] = daily_df['UnitPrice'].ffill()  # Forward fill unit prices
     
     # Calculate simple MA without normalization
     daily_df['MA'] = daily_df['TotalPrice'].rolling(
@@ -603,80 +707,49 @@ def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=
         return None  # Not enough data
     
     # Group by resolution
-    freq_map = {
-        '3D': '3D',
-        '1W': 'W',
-        '2W': '2W',
-        '1M': 'M'
-    }
-    freq = freq_map[resolution]
+    freq = RESOLUTION_FREQ[resolution]
+    if resolution not in RESOLUTION_STEP:
+        raise ValueError(f"Unsupported candle resolution: {resolution}")
     
-    grouped = df.groupby(pd.Grouper(key='date', freq=freq)).agg({
-        'TotalPrice': list,
+    grouped = df.groupby(pd.Grouper(key='date', freq=freq, label='left', closed='left')).agg({
         'Quantity': 'sum'
     })
     
     # Create OHLCV DataFrame
     ohlcv = pd.DataFrame(index=grouped.index)
     ohlcv['volume'] = grouped['Quantity']
-    ohlcv['unit_price'] = daily_df['UnitPrice'].resample(freq).mean().ffill()
-    
-    # Initialize is_live column (marks current open candle)
-    ohlcv['is_live'] = False
+    ohlcv['unit_price'] = daily_df['UnitPrice'].resample(freq, label='left', closed='left').mean()  # Daily prices are already filled
     
     # Get the last available date with data
     last_data_date = daily_df.index[-1]
-    
-    # Calculate OHLC values including current open candle
-    for idx in grouped.index:
-        if idx < first_valid_ma:
-            continue
-            
-        period_start = idx
-        period_end = idx + pd.Timedelta(freq)
-        
-        # Check if period start is valid
-        if period_start not in daily_df.index:
-            continue
-        
-        # Check if this is the current/open candle
-        is_current_candle = period_end > last_data_date
-        
-        if is_current_candle:
-            # LIVE CANDLE: Use current data through today
-            period_data = daily_df.loc[period_start:last_data_date, 'MA']
-            
-            if len(period_data) < 1:
-                continue
-            
-            ma_start = period_data.iloc[0]
-            ma_current = daily_df['MA'].iloc[-1]  # Current MA value
-            
-            # Set OHLC values using live data
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_current  # Live close value
-            ohlcv.at[idx, 'high'] = period_data.max()
-            ohlcv.at[idx, 'low'] = period_data.min()
-            ohlcv.at[idx, 'is_live'] = True
-            
-        else:
-            # CLOSED CANDLE: Use complete period data
-            if period_end > daily_df.index[-1]:
-                continue
-                
-            # Get MA values - handle case where we might not have enough data points
-            period_data = daily_df.loc[period_start:period_end, 'MA']
-            if len(period_data) < 2:
-                continue
-                
-            ma_start = period_data.iloc[0]
-            ma_end = period_data.iloc[-1]
-            
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_end
-            ohlcv.at[idx, 'high'] = period_data.max()
-            ohlcv.at[idx, 'low'] = period_data.min()
-            ohlcv.at[idx, 'is_live'] = False
+    ma = daily_df['MA']
+    
+    # Candles cover period_start..period_end inclusive (clipped to today when
+    # live); reversed rolling windows over the daily MA give all highs/lows at once
+    step = RESOLUTION_STEP[resolution]
+    window = step.days + 1
+    reversed_ma = ma.iloc[::-1].rolling(window, min_periods=1)
+    window_high = reversed_ma.max().iloc[::-1]
+    window_low = reversed_ma.min().iloc[::-1]
+    window_count = reversed_ma.count().iloc[::-1]
+    
+    period_starts = ohlcv.index
+    period_ends = period_starts + step
+    
+    # Current/open candle: period extends beyond available data. Closed candles
+    # need at least two valid daily MA points in their window.
+    is_live = period_ends > last_data_date
+    in_range = (period_starts >= first_valid_ma) & period_starts.isin(daily_df.index)
+    live = in_range & is_live
+    closed = in_range & ~is_live & (window_count.reindex(period_starts).to_numpy() >= 2)
+    
+    # Set OHLC values; live candles close on the current MA value
+    ohlcv['is_live'] = live
+    ohlcv['open'] = ma.reindex(period_starts).to_numpy()
+    ohlcv['close'] = np.where(live, ma.iloc[-1], ma.reindex(period_ends).to_numpy())
+    ohlcv['high'] = window_high.reindex(period_starts).to_numpy()
+    ohlcv['low'] = window_low.reindex(period_starts).to_numpy()
+    ohlcv = ohlcv[live | closed]
     
     ohlcv = ohlcv.dropna()
     
@@ -685,6 +758,7 @@ def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=
     
     return ohlcv
 
+@ttl_memoize(ttl=PRICEBOOK_CACHE_TTL, cache_empty=False)
 def get_pricebook_prices(product_ids):
     """
     Get current unit prices from Pricebook for given Product2Ids
@@ -695,28 +769,18 @@ def get_pricebook_prices(product_ids):
     
     print(f"\n🔍 Fetching pricebook prices for {len(product_ids)} products...")
     
-    # First, get the standard pricebook ID
-    try:
-        std_pricebook = sf.query("SELECT Id FROM Pricebook2 WHERE IsStandard = true LIMIT 1")
-        if not std_pricebook['records']:
-            print("  ⚠️  Warning: No standard pricebook found, falling back to historical prices")
-            return {}
-        
-        pricebook_id = std_pricebook['records'][0]['Id']
-        print(f"  Using Standard Pricebook: {pricebook_id}")
-    except Exception as e:
-        print(f"  ⚠️  Error getting standard pricebook: {str(e)}")
-        return {}
+    # Query standard PricebookEntry rows for all products; filtering on the
+    # Pricebook2 relationship saves a separate standard pricebook lookup
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
     
-    # Query PricebookEntry for all products
-    product_id_list = "','".join(product_ids)
-    query = f"""
+    query = format_soql("""
         SELECT Product2Id, UnitPrice, IsActive, Product2.Name
         FROM PricebookEntry
-        WHERE Pricebook2Id = '{pricebook_id}'
-        AND Product2Id IN ('{product_id_list}')
+        WHERE Pricebook2.IsStandard = true
+        AND Product2Id IN {}
         AND IsActive = true
-    """
+    """, list(product_ids))
     
     try:
         results = sf.query_all(query)
@@ -727,7 +791,7 @@ def get_pricebook_prices(product_ids):
             unit_price = float(record['UnitPrice'])
             product_name = record['Product2']['Name'] if record.get('Product2') else 'Unknown'
             price_map[product_id] = unit_price
-            print(f"  ✓ {product_name}: ${unit_price:.2f}")
+            logger.debug("Pricebook price %s: $%.2f", product_name, unit_price)
         
         # Report any products not found in pricebook
         missing = set(product_ids) - set(price_map.keys())
@@ -737,25 +801,35 @@ def get_pricebook_prices(product_ids):
         print(f"  ✓ Found pricebook prices for {len(price_map)}/{len(product_ids)} products\n")
         return price_map
         
+    except SalesforceExpiredSession:
+        # Let the caller log in again rather than reporting no data
+        raise
     except Exception as e:
         print(f"  ⚠️  Error querying pricebook entries: {str(e)}")
         return {}
 
+# Keyed by calendar day: callers pass datetime.now()-based bounds, which would
+# otherwise never repeat
+@ttl_memoize(ttl=PRODUCT_CACHE_TTL, cache_empty=False,
+             key=lambda account_id, start_date, end_date: (account_id, start_date.date(), end_date.date()))
 def get_account_products(account_id, start_date, end_date):
     """
     Get unique products ordered by an account with full product name fallbacks
     """
-    query = f"""
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+    
+    query = format_soql("""
         SELECT 
             Product2Id,
             Product_Name__c,
             Product2.Name,
             Product2.ProductCode
         FROM OrderItem 
-        WHERE Order.AccountId = '{account_id}'
-        AND Order.MBL_Order_Shipped_Time__c >= {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')}
-        AND Order.MBL_Order_Shipped_Time__c <= {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}
-    """
+        WHERE Order.AccountId = {}
+        AND Order.MBL_Order_Shipped_Time__c >= {:literal}
+        AND Order.MBL_Order_Shipped_Time__c <= {:literal}
+    """, account_id, start_date.strftime('%Y-%m-%dT%H:%M:%SZ'), end_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     products = sf.query_all(query)
     
     # Create dictionary of unique products with cascading name fallback
@@ -767,53 +841,63 @@ def get_account_products(account_id, start_date, end_date):
             product_name = (record.get('Product_Name__c') or '').strip()
             
             # Debug output for each product
-            print(f"Debug: Product2Id {product_id}")
-            print(f"  - Product_Name__c: '{record.get('Product_Name__c')}'")
-            print(f"  - Product2: {record.get('Product2')}")
+            logger.debug("Product2Id %s: Product_Name__c=%r, Product2=%s",
+                         product_id, record.get('Product_Name__c'), record.get('Product2'))
             
             # If Product_Name__c is empty, try Product2.Name
             if not product_name and record.get('Product2'):
                 product_name = (record['Product2'].get('Name') or '').strip()
                 if product_name:
-                    print(f"  ✓ Using Product2.Name: {product_name}")
+                    logger.debug("Using Product2.Name: %s", product_name)
             
             # If still empty, try Product2.ProductCode
             if not product_name and record.get('Product2'):
                 product_name = (record['Product2'].get('ProductCode') or '').strip()
                 if product_name:
-                    print(f"  ⚠ Using ProductCode: {product_name}")
-            
-            # Last resort - query Product2 directly from Salesforce
-            if not product_name:
-                print(f"  ⚠ All name fields empty, querying Product2 directly...")
-                try:
-                    product_direct = sf.query(f"SELECT Name, ProductCode, Description FROM Product2 WHERE Id = '{product_id}'")
-                    if product_direct['records']:
-                        prod_record = product_direct['records'][0]
-                        product_name = (prod_record.get('Name') or '').strip()
-                        if not product_name:
-                            product_name = (prod_record.get('ProductCode') or '').strip()
-                        if not product_name:
-                            product_name = (prod_record.get('Description') or '').strip()
-                        if product_name:
-                            print(f"  ✓ Retrieved from Product2 direct query: {product_name}")
-                except Exception as e:
-                    print(f"  ✗ Error querying Product2 directly: {str(e)}")
-            
-            # Final fallback
-            if not product_name:
-                product_name = f'Unknown Product ({product_id})'
-                print(f"  ✗ No name found, using: {product_name}")
+                    logger.debug("Using ProductCode: %s", product_name)
             
+            # Empty names are looked up from Product2 below
             unique_products[product_id] = product_name
     
+    # Last resort - query Product2 directly from Salesforce, batched for all
+    # products whose name fields were empty
+    missing_ids = [product_id for product_id, product_name in unique_products.items() if not product_name]
+    if missing_ids:
+        print(f"  ⚠ All name fields empty for {len(missing_ids)} products, querying Product2 directly...")
+        for i in range(0, len(missing_ids), PRODUCT_NAME_BATCH_SIZE):
+            batch_ids = missing_ids[i:i + PRODUCT_NAME_BATCH_SIZE]
+            try:
+                for prod_record in sf.query_all_iter(format_soql(
+                        "SELECT Id, Name, ProductCode, Description FROM Product2 WHERE Id IN {}", batch_ids)):
+                    product_name = (prod_record.get('Name') or '').strip()
+                    if not product_name:
+                        product_name = (prod_record.get('ProductCode') or '').strip()
+                    if not product_name:
+                        product_name = (prod_record.get('Description') or '').strip()
+                    if product_name and prod_record['Id'] in unique_products:
+                        unique_products[prod_record['Id']] = product_name
+                        logger.debug("Retrieved from Product2 direct query: %s", product_name)
+            except SalesforceExpiredSession:
+                # Let the caller log in again rather than reporting no data
+                raise
+            except Exception as e:
+                print(f"  ✗ Error querying Product2 directly: {str(e)}")
+    
+    # Final fallback
+    for product_id in missing_ids:
+        if not unique_products[product_id]:
+            unique_products[product_id] = f'Unknown Product ({product_id})'
+            print(f"  ✗ No name found, using: {unique_products[product_id]}")
+    
     print(f"\nFound {len(unique_products)} unique products for account")
     return unique_products
 
 def consolidate_product_data(analyses, resolution_freq, analysis_start_date, end_date_timestamp):
     """
     Consolidate all product data to ensure consistent time periods across all products.
-    Returns a dictionary of {date: {product_name: value}}
+    Returns a DataFrame indexed by date with one column of close values per product
+    (NaN before the product's first period). Columns are ordered by first period,
+    then by their order in analyses.
     """
     # Create a uniform date range
     consolidated_range = pd.date_range(
@@ -822,34 +906,36 @@ def consolidate_product_data(analyses, resolution_freq, analysis_start_date, end
         freq=resolution_freq
     )
     
-    # Initialize the consolidated data structure
-    consolidated_data = {date: {} for date in consolidated_range}
+    products = [
+        (product_name, df) for product_name, df in analyses.items()
+        if product_name != 'Account Overview' and df is not None and not df.empty
+    ]
+    
+    # One contiguous float column per product
+    values = np.full((len(consolidated_range), len(products)), np.nan)
+    first_rows = np.full(len(products), len(consolidated_range))
     
     # Process each product's data
-    for product_name, df in analyses.items():
-        if product_name == 'Account Overview' or df is None or df.empty:
-            continue
-            
+    for column, (product_name, df) in enumerate(products):
         print(f"Consolidating data for {product_name}: {len(df)} original data points")
         
-        # For each date in our consolidated range, find the matching product value
-        for target_date in consolidated_range:
-            if target_date in df.index:
-                # Direct match
-                consolidated_data[target_date][product_name] = df.loc[target_date, 'close']
-            else:
-                # Find the most recent value before this date
-                mask = df.index <= target_date
-                if mask.any():
-                    latest_value = df[mask]['close'].iloc[-1]
-                    consolidated_data[target_date][product_name] = latest_value
-    
-    # Count unique products for debugging
-    all_products = set()
-    for date_data in consolidated_data.values():
-        all_products.update(date_data.keys())
+        # For each date in our consolidated range, take the value on that date or
+        # the most recent one before it; -1 marks dates before the product's first period
+        positions = df.index.get_indexer(consolidated_range, method='pad')
+        found = positions >= 0
+        values[found, column] = df['close'].to_numpy(dtype=np.float64)[positions[found]]
+        if found.any():
+            first_rows[column] = found.argmax()
+    
+    # Keep products with at least one consolidated value, earliest first
+    order = [column for column in np.argsort(first_rows, kind='stable') if first_rows[column] < len(consolidated_range)]
+    consolidated_data = pd.DataFrame(
+        values[:, order],
+        index=consolidated_range,
+        columns=[products[column][0] for column in order]
+    )
     
-    print(f"Consolidated data includes {len(all_products)} unique products")
+    print(f"Consolidated data includes {len(consolidated_data.columns)} unique products")
     
     return consolidated_data
 
@@ -861,52 +947,42 @@ def calculate_average_order_interval(df):
     if df is None or df.empty or 'volume' not in df.columns:
         return None
     
-    # Get dates where volume > 0 (actual orders)
-    order_dates = df[df['volume'] > 0].index
-    if len(order_dates) < 2:
+    # Get dates where volume > 0 (actual orders) as int64 nanoseconds
+    order_ns = df.index[df['volume'].to_numpy() > 0].as_unit('ns').asi8
+    if len(order_ns) < 2:
         return None
     
-    # Calculate differences between consecutive orders
-    intervals = np.diff(order_dates)
-    avg_interval = np.mean(intervals)
-    
-    # Convert timedelta to days
-    return avg_interval.days
+    # The mean gap between consecutive orders telescopes to (last - first) / (n - 1);
+    # floor division gives whole days like Timedelta.days
+    return int((order_ns[-1] - order_ns[0]) // ((len(order_ns) - 1) * NS_PER_DAY))
 
 def get_trend_description(current_rsi):
     """
     Get a plain language description of the RSI trend
     """
-    if current_rsi < 30:
-        return "Very open to ordering"
-    elif current_rsi < 40:
-        return "Open to ordering"
-    elif current_rsi < 45:
-        return "Neutral"
-    elif current_rsi < 50:
-        return "Resistant to ordering"
-    else:
-        return "Strongly resistant to ordering"
+    return RSI_TREND_LABELS[bisect.bisect_right(RSI_TREND_THRESHOLDS, current_rsi)]
+
+def format_report_date(d):
+    """
+    Format a date as YYYY.MM.DD for the opportunity report
+    """
+    return f"{d.year:04d}.{d.month:02d}.{d.day:02d}"
 
 def create_bb_spectrum(position_in_band):
     """
     Create a visual spectrum representation of position within Bollinger Bands
     Returns a string with wider spacing to match the key format
     """
-    # Create a wider spectrum with more dashes
-    spectrum = list('||---------------||----------------||')
-    
     if position_in_band < 0:  # Below floor
-        spectrum.insert(0, 'x')
-    elif position_in_band > 100:  # Above ceiling
-        spectrum.append('x')
-    else:
-        # Calculate position in the wider spectrum (now with more positions)
-        # We have 31 possible positions (15 dashes in each section + the dividers)
-        pos = int(2 + (position_in_band / 100.0 * 31))
-        spectrum[pos] = 'x'
-    
-    return ''.join(spectrum)
+        return 'x' + BB_SPECTRUM_TEMPLATE.decode('ascii')
+    if position_in_band > 100:  # Above ceiling
+        return BB_SPECTRUM_TEMPLATE.decode('ascii') + 'x'
+
+    # Calculate position in the wider spectrum (now with more positions)
+    # We have 31 possible positions (15 dashes in each section + the dividers)
+    spectrum = bytearray(BB_SPECTRUM_TEMPLATE)
+    spectrum[int(2 + (position_in_band / 100.0 * 31))] = ord('x')
+    return spectrum.decode('ascii')
 
 def calculate_order_recommendations(opp):
     """
@@ -918,18 +994,21 @@ def calculate_order_recommendations(opp):
     bb_middle = opp['bb_middle']
     bb_upper = opp['bb_upper']
     
+    # Accept either a list or an ndarray of volumes
+    volume = np.asarray(opp['volume'], dtype=np.float64)
+    
     # Get the product's average price per unit from recent orders
-    recent_volume = sum(opp['volume'][-14:])  # Last 14 periods
+    recent_volume = volume[-14:].sum()  # Last 14 periods
     if recent_volume == 0:
         return None  # Can't calculate without recent order data
         
-    recent_value = sum(opp['volume'][-14:] * opp['current_close'])
+    recent_value = recent_volume * current_value
     avg_price_per_unit = recent_value / recent_volume
     
     # Calculate how many days until value drops below lower band
     if current_value > bb_lower:
         # Use the average daily decline rate from the last period
-        daily_decline = (opp['volume'][0] - opp['volume'][-1]) / len(opp['volume'])
+        daily_decline = (volume[0] - volume[-1]) / len(volume)
         if daily_decline > 0:
             days_until_lower = (current_value - bb_lower) / daily_decline
         else:
@@ -988,8 +1067,15 @@ def format_opportunity_report(opportunities, account_analysis=None):
     - account_analysis: Account overview DataFrame with indicators (optional)
     """
     try:
+        # One clock read for the whole report so every product is bucketed
+        # against the same moment
+        now = datetime.now()
+        
         report = ["Product Sales Opportunity Report"]
-        report.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        report.append(
+            f"Generated on: {now.year:04d}-{now.month:02d}-{now.day:02d} "
+            f"{now.hour:02d}:{now.minute:02d}:{now.second:02d}"
+        )
         
         # Add the report legend
         report.append("\n" + "=" * 80 + "\n")
@@ -1021,26 +1107,29 @@ def format_opportunity_report(opportunities, account_analysis=None):
             report.append("No priority opportunities found matching criteria.\n")
             return "\n".join(report)
 
-        # Group opportunities by workweek based on next order date
+        # Group opportunities by workweek based on next order date.
+        # Weeks are keyed by their Monday; the label is formatted once per week.
         order_weeks = {}
         for opp in opportunities:
             if opp.get('order_interval'):
-                next_order_date = datetime.now() + timedelta(days=opp['order_interval'])
-                days_until_monday = (next_order_date.weekday()) % 7
-                week_start = next_order_date - timedelta(days=days_until_monday)
-                week_end = week_start + timedelta(days=4)  # End on Friday
-                week_key = f"{week_start.strftime('%Y.%m.%d')} - {week_end.strftime('%Y.%m.%d')}"
+                next_order_date = now + timedelta(days=opp['order_interval'])
+                week_key = next_order_date.date() - timedelta(days=next_order_date.weekday())
                 
                 if week_key not in order_weeks:
+                    week_start = next_order_date - timedelta(days=next_order_date.weekday())
+                    week_end = week_start + timedelta(days=4)  # End on Friday
                     order_weeks[week_key] = {
                         'products': [],
                         'conservative': 0,
                         'balanced': 0,
                         'aggressive': 0,
                         'start_date': week_start,
-                        'end_date': week_end
+                        'end_date': week_end,
+                        'label': f"{format_report_date(week_start)} - {format_report_date(week_end)}",
+                        'targets': []
                     }
                 order_weeks[week_key]['products'].append(opp)
+                order_weeks[week_key]['targets'].append(calculate_opportunity_targets(opp))
 
         # Sort weeks chronologically
         sorted_week_keys = sorted(order_weeks.keys())
@@ -1050,59 +1139,40 @@ def format_opportunity_report(opportunities, account_analysis=None):
             week_data = order_weeks[week_key]
             week_products = week_data['products']
             
-            # Calculate total recommended values for this week
-            for opp in week_products:
-                # Debug: Check for missing Bollinger Bands data
-                if 'bb_upper' not in opp or 'bb_lower' not in opp or 'bb_middle' not in opp:
-                    print(f"Debug: Missing BB data in week calculation for {opp.get('product', 'unknown')}")
-                    print(f"  Available keys: {list(opp.keys())}")
-                    print(f"  Has bb_upper: {'bb_upper' in opp}")
-                    print(f"  Has bb_lower: {'bb_lower' in opp}")
-                    print(f"  Has bb_middle: {'bb_middle' in opp}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
-                
-                # Target the correct percentile levels:
-                # Conservative = 50th percentile (bb_middle)
-                # Balanced = 70th percentile (between middle and upper)
-                # Aggressive = 100th percentile (bb_upper)
-                bb_70th = opp['bb_lower'] + (opp['bb_upper'] - opp['bb_lower']) * 0.7
-                
-                cons_qty = calculate_target_quantity(opp, opp['bb_middle'])
-                bal_qty = calculate_target_quantity(opp, bb_70th)
-                agg_qty = calculate_target_quantity(opp, opp['bb_upper'])
-                
-                week_data['conservative'] += cons_qty * opp['unit_price']
-                week_data['balanced'] += bal_qty * opp['unit_price']
-                week_data['aggressive'] += agg_qty * opp['unit_price']
+            # Calculate total recommended values for this week:
+            # (products x [cons, bal, agg]) quantities dotted with unit prices
+            priced = [
+                (opp['unit_price'], targets)
+                for opp, targets in zip(week_products, week_data['targets'])
+                if targets is not None
+            ]
+            if priced:
+                prices = np.array([price for price, _ in priced], dtype=np.float64)
+                quantities = np.array([targets for _, targets in priced], dtype=np.float64)
+                week_data['conservative'], week_data['balanced'], week_data['aggressive'] = (
+                    float(total) for total in prices @ quantities
+                )
             
             # Add week header with value ranges
-            report.append(f"ORDER WEEK: {week_key}")
+            report.append(f"ORDER WEEK: {week_data['label']}")
             report.append(f"Value Range: [${week_data['conservative']:,.0f} < ${week_data['balanced']:,.0f} < ${week_data['aggressive']:,.0f}]")
             report.append(f"Products Due: {len(week_products)}\n")
             
             # Sort products within this week by priority score
-            products = sorted(week_products, key=lambda x: x['priority_score'])
+            products = sorted(
+                zip(week_products, week_data['targets']),
+                key=lambda x: x[0]['priority_score']
+            )
             
             # Process all products for this week
-            for j, opp in enumerate(products):
+            for j, (opp, targets) in enumerate(products):
                 try:
-                    # Debug: Check for missing Bollinger Bands data before processing
-                    if 'bb_upper' not in opp or 'bb_lower' not in opp or 'bb_middle' not in opp:
-                        print(f"Debug: Missing BB data in product formatting for {opp.get('product', 'unknown')}")
-                        print(f"  Available keys: {list(opp.keys())}")
-                        print(f"  Has bb_upper: {'bb_upper' in opp}")
-                        print(f"  Has bb_lower: {'bb_lower' in opp}")
-                        print(f"  Has bb_middle: {'bb_middle' in opp}")
-                        print(f"  Full opportunity dict: {opp}")
-                        import traceback
-                        traceback.print_exc()
+                    if targets is None:
                         report.append(f"\nError: Missing Bollinger Bands data for {opp.get('product', 'unknown')}\n")
                         continue
                     
                     spectrum = create_bb_spectrum(opp['position_in_band'])
-                    next_order = datetime.now() + timedelta(days=opp['order_interval'])
+                    next_order = now + timedelta(days=opp['order_interval'])
                     
                     # Add a blank line between products (but not before the first one)
                     if j > 0:
@@ -1111,7 +1181,7 @@ def format_opportunity_report(opportunities, account_analysis=None):
                     # Format the product entry with indentation for hierarchy
                     report.append(f"  {opp['product']}")
                     report.append(f"     Priority: {opp['contribution_rank']}")
-                    report.append(f"     Next Order Due: {next_order.strftime('%Y.%m.%d')}")
+                    report.append(f"     Next Order Due: {format_report_date(next_order)}")
                     report.append(f"     Current Position:")
                     report.append(f"     {spectrum}")
                     report.append(f"     Floor -------- Average -------- Ceiling")
@@ -1119,16 +1189,8 @@ def format_opportunity_report(opportunities, account_analysis=None):
                     # Add order recommendations with value projections
                     report.append("     Order Recommendations:")
                     
-                    # Calculate quantities and values for each level
-                    # Target the correct percentile levels:
-                    # Conservative = 50th percentile (bb_middle)
-                    # Balanced = 70th percentile (between middle and upper)
-                    # Aggressive = 100th percentile (bb_upper)
-                    bb_70th = opp['bb_lower'] + (opp['bb_upper'] - opp['bb_lower']) * 0.7
-                    
-                    cons_qty = calculate_target_quantity(opp, opp['bb_middle'])
-                    bal_qty = calculate_target_quantity(opp, bb_70th)
-                    agg_qty = calculate_target_quantity(opp, opp['bb_upper'])
+                    # Quantities and values for each level
+                    cons_qty, bal_qty, agg_qty = targets
                     
                     cons_value = cons_qty * opp['unit_price']
                     bal_value = bal_qty * opp['unit_price']
@@ -1211,20 +1273,20 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     print(f"Retrieved {len(orders)} orders for account")
     account_df = create_ohlcv_from_orders(orders, resolution=resolution, ma_window=ma_window)
     
+    # start_date as a Timestamp matching an index timezone (None for a naive index),
+    # built once per timezone and shared by the account and every product
+    start_timestamps = {}
+    def start_timestamp(tz):
+        if tz not in start_timestamps:
+            start_timestamps[tz] = pd.Timestamp(start_date).tz_localize(tz)
+        return start_timestamps[tz]
+    
     # Filter the account_df to only include dates after the actual analysis start date
     if not account_df.empty:
-        # Convert start_date to match the timezone of the DataFrame index
-        # First check if the index has a timezone
-        if account_df.index.tz is not None:
-            # Convert start_date to a timezone-aware datetime with the same timezone
-            start_date_tz = pd.Timestamp(start_date).tz_localize(account_df.index.tz)
-        else:
-            # If index is timezone-naive, use naive start_date
-            start_date_tz = pd.Timestamp(start_date).tz_localize(None)
-            
-        # Now filter with matching timezone types
-        analysis_mask = account_df.index >= start_date_tz
-        analysis_account_df = account_df[analysis_mask].copy()
+        # Convert start_date to match the timezone of the DataFrame index, then
+        # slice the (sorted) index from there
+        start_date_tz = start_timestamp(account_df.index.tz)
+        analysis_account_df = account_df.loc[start_date_tz:].copy()
         
         # Only calculate indicators on the analysis period data
         analysis_account_df = calculate_indicators(analysis_account_df, MA_length=18)
@@ -1232,8 +1294,9 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     
     # Check if account_df has the required columns before creating colors
     if not account_df.empty and all(col in account_df.columns for col in ['open', 'close']):
-        colors['Account Overview'] = ['red' if row['open'] > row['close'] else 'green' 
-                                    for i, row in account_df.iterrows()]
+        colors['Account Overview'] = np.where(
+            account_df['open'].to_numpy() > account_df['close'].to_numpy(), 'red', 'green'
+        ).tolist()
     else:
         # Provide default colors if OHLC data is missing
         colors['Account Overview'] = ['green'] * len(account_df) if not account_df.empty else []
@@ -1247,32 +1310,44 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     # Get current pricebook prices for all products
     pricebook_prices = get_pricebook_prices(list(products.keys()))
     
-    # Filter and create product analyses
+    # Flatten and split order items by product once so each product build gets its own frame
+    product_frames = index_order_products(order_products)
+    
+    # Create product OHLCV with the same ma_window as account level, trimmed to the
+    # analysis period and with indicators applied; products are independent, so
+    # build them on a small pool and consume in product order
+    def build_product_analysis(product_id):
+        df = create_product_ohlcv(product_frames.get(product_id), product_id,
+                                  resolution, ma_window, pricebook_prices)
+        if df is None or df.empty:
+            return None
+        
+        # Filter to only include dates after the actual analysis start date
+        # Use the same timezone handling as above
+        analysis_df = df.loc[start_timestamp(df.index.tz):].copy()
+        
+        if not analysis_df.empty:
+            analysis_df = calculate_indicators(analysis_df, MA_length=18)
+        return analysis_df
+    
+    with ThreadPoolExecutor(max_workers=PRODUCT_OHLCV_WORKERS) as executor:
+        product_analyses = dict(zip(products, executor.map(build_product_analysis, products)))
+    
+    # Collect product analyses
     for product_id, product_name in products.items():
         print(f"Processing product: {product_name}")
         
-        # Create product OHLCV with the same ma_window as account level
-        df = create_product_ohlcv(order_products, product_id, resolution, ma_window, pricebook_prices)
-        if df is not None and not df.empty:
-            # Filter to only include dates after the actual analysis start date
-            # Use the same timezone handling as above
-            if df.index.tz is not None:
-                start_date_tz = pd.Timestamp(start_date).tz_localize(df.index.tz)
-            else:
-                start_date_tz = pd.Timestamp(start_date).tz_localize(None)
-            
-            analysis_mask = df.index >= start_date_tz
-            analysis_df = df[analysis_mask].copy()
-            
+        analysis_df = product_analyses[product_id]
+        if analysis_df is not None:
             if not analysis_df.empty:
                 print(f"  - {product_name}: {len(analysis_df)} data points")
-                analysis_df = calculate_indicators(analysis_df, MA_length=18)
                 analyses[product_name] = analysis_df  # Store the analysis
                 
                 # Check if df has the required columns before creating colors
                 if all(col in analysis_df.columns for col in ['open', 'close']):
-                    colors[product_name] = ['red' if row['open'] > row['close'] else 'green' 
-                                          for i, row in analysis_df.iterrows()]
+                    colors[product_name] = np.where(
+                        analysis_df['open'].to_numpy() > analysis_df['close'].to_numpy(), 'red', 'green'
+                    ).tolist()
                 else:
                     # Provide default colors if OHLC data is missing
                     colors[product_name] = ['green'] * len(analysis_df)
@@ -1281,13 +1356,6 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         else:
             print(f"  - {product_name}: No valid OHLCV data")
     
-    # Create a common date range for all products
-    all_dates = set()
-    for product_name, df in analyses.items():
-        if df is not None and not df.empty:
-            all_dates.update(df.index)
-    all_dates = sorted(all_dates)
-
     # Debug: Print first and last dates for each product
     print("\nProduct date ranges:")
     for product_name, df in analyses.items():
@@ -1296,12 +1364,8 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
 
     # Define analysis_start_date - make sure account_df is valid before using it
     if not account_df.empty:
-        if account_df.index.tz is not None:
-            # If the account dataframe has timezone-aware index, match that
-            analysis_start_date = pd.Timestamp(start_date).tz_localize(account_df.index.tz)
-        else:
-            # Otherwise use timezone-naive date
-            analysis_start_date = pd.Timestamp(start_date).tz_localize(None)
+        # Match the account dataframe's timezone (or lack of one)
+        analysis_start_date = start_timestamp(account_df.index.tz)
     else:
         # Fallback if account_df is empty
         analysis_start_date = pd.Timestamp(start_date)
@@ -1341,16 +1405,12 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     ohlc_min = float('inf')
     ohlc_max = float('-inf')
     
-    # Find min and max values across all visible OHLC traces
-    for name, df in analyses.items():
-        if df is None or df.empty:
-            continue
-            
-        if all(col in df.columns for col in ['low', 'high']):
-            # Only consider Account Overview by default (since it's the only one visible initially)
-            if name == 'Account Overview':
-                ohlc_min = min(ohlc_min, df['low'].min())
-                ohlc_max = max(ohlc_max, df['high'].max())
+    # Find min and max values across visible OHLC traces - only Account Overview
+    # is visible initially, so there is no need to walk the product analyses
+    overview_df = analyses.get('Account Overview')
+    if overview_df is not None and not overview_df.empty and all(col in overview_df.columns for col in ['low', 'high']):
+        ohlc_min = min(ohlc_min, overview_df['low'].min())
+        ohlc_max = max(ohlc_max, overview_df['high'].max())
     
     # Add buffer (10% on top, 5% on bottom)
     if ohlc_min != float('inf') and ohlc_max != float('-inf'):
@@ -1365,18 +1425,30 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             row=1, col=1
         )
     
+    # Each analysis' position in analyses picks its color, for both its OHLC
+    # traces and its contribution trace
+    analysis_positions = {name: position for position, name in enumerate(analyses)}
+    
+    # Indices of each analysis' traces in fig.data, recorded as they are added
+    trace_groups = {}
+    
     # STEP 1: ADD REGULAR ANALYSIS TRACES FIRST
     # Add the regular analysis traces before contribution traces
     for name, df in analyses.items():
         if df is None or df.empty:
             # print(f"Warning: No data for {name}, skipping visualization")
             continue
+        
+        first_trace_idx = len(fig.data)
+        
+        # Column lookups below go against one set per analysis
+        columns = set(df.columns)
             
         # Set initial visibility - only Account Overview visible by default
         is_visible = name == 'Account Overview'
         
         # Generate a unique color for this analysis
-        color_idx = list(analyses.keys()).index(name) % len(analysis_colors)
+        color_idx = analysis_positions[name] % len(analysis_colors)
         base_color = analysis_colors[color_idx]
         
         # Parse the RGB values from the color string and make darker version (50% darker)
@@ -1389,8 +1461,8 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             darker_color = 'rgba(100, 100, 100, 1)'
         
         # OHLC chart - only add if all required columns exist and we have sufficient data
-        if all(col in df.columns for col in ['open', 'high', 'low', 'close']):
-            if 'insufficient_data' in df.columns and df['insufficient_data'].any():
+        if {'open', 'high', 'low', 'close'} <= columns:
+            if 'insufficient_data' in columns and df['insufficient_data'].any():
                 # Add a text annotation instead of the chart
                 fig.add_annotation(
                     x=df.index[len(df.index)//2],  # Center of x-axis
@@ -1424,37 +1496,45 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
                 )
         
         # Bollinger Bands with matching colors - only add if they exist
-        for band, label in [('bb_upper', 'Upper'), ('bb_middle', 'Middle'), ('bb_lower', 'Lower')]:
-            if band in df.columns and not df[band].isna().all():  # Check if column exists AND has valid data
-                fig.add_trace(
-                    go.Scatter(
-                        x=df.index,
-                        y=df[band],
-                        name=f"{name} BB {label}",
-                        line=dict(
-                            color=base_color,
-                            width=1,
-                            dash='dash'
-                        ),
-                        opacity=0.3,
-                        visible=is_visible
+        bands = [
+            band for band in ['bb_upper', 'bb_middle', 'bb_lower']
+            if band in columns and df[band].notna().any()  # Check if column exists AND has valid data
+        ]
+        if bands:
+            # Draw all bands as one trace, one segment per band separated by a gap
+            band_x, band_y = [], []
+            for band in bands:
+                if band_x:
+                    band_x.append(None)
+                    band_y.append([np.nan])
+                band_x.extend(df.index)
+                band_y.append(df[band].to_numpy(dtype=np.float64))
+            
+            fig.add_trace(
+                go.Scatter(
+                    x=band_x,
+                    y=np.concatenate(band_y),
+                    name=f"{name} BB",
+                    line=dict(
+                        color=base_color,
+                        width=1,
+                        dash='dash'
                     ),
-                    row=1, col=1
-                )
+                    opacity=0.3,
+                    connectgaps=False,
+                    visible=is_visible
+                ),
+                row=1, col=1
+            )
         
         # Volume with color-coded bars - only add if volume column exists
-        if 'volume' in df.columns:
+        if 'volume' in columns:
             # Check if we have OHLC data for coloring
-            if all(col in df.columns for col in ['open', 'close']):
+            if {'open', 'close'} <= columns:
                 # Use OHLC data for coloring
-                bar_colors = [
-                    base_color if close >= open else darker_color
-                    for open, close in zip(df['open'], df['close'])
-                ]
-                bar_opacities = [
-                    0.6 if close >= open else 0.8
-                    for open, close in zip(df['open'], df['close'])
-                ]
+                up_bars = df['close'].to_numpy() >= df['open'].to_numpy()
+                bar_colors = np.where(up_bars, base_color, darker_color).tolist()
+                bar_opacities = np.where(up_bars, 0.6, 0.8).tolist()
             else:
                 # Use default coloring if OHLC data is missing
                 bar_colors = [base_color] * len(df)
@@ -1475,7 +1555,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         )
         
         # Add volume SMA if it exists
-        if 'volume_sma' in df.columns:
+        if 'volume_sma' in columns:
             fig.add_trace(
                 go.Scatter(
                     x=df.index,
@@ -1492,7 +1572,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             )
         
         # RSI with matching colors - only add if it exists
-        if 'rsi' in df.columns:
+        if 'rsi' in columns:
             fig.add_trace(
                 go.Scatter(
                     x=df.index,
@@ -1505,7 +1585,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             )
             
             # Add RSI MA if it exists
-            if 'rsi_ma' in df.columns:
+            if 'rsi_ma' in columns:
                 fig.add_trace(
                     go.Scatter(
                         x=df.index,
@@ -1522,17 +1602,12 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
                 )
         
         # MACD lines and histogram - only add if they exist
-        if all(col in df.columns for col in ['macd', 'macd_signal', 'macd_hist']):
+        if {'macd', 'macd_signal', 'macd_hist'} <= columns:
             # First add the histogram
             # Prepare colors for MACD histogram
-            macd_colors = [
-                base_color if val >= 0 else darker_color
-                for val in df['macd_hist']
-            ]
-            macd_opacities = [
-                0.6 if val >= 0 else 0.8
-                for val in df['macd_hist']
-            ]
+            rising_hist = df['macd_hist'].to_numpy() >= 0
+            macd_colors = np.where(rising_hist, base_color, darker_color).tolist()
+            macd_opacities = np.where(rising_hist, 0.6, 0.8).tolist()
             
             fig.add_trace(
                 go.Bar(
@@ -1578,6 +1653,9 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         else:
             # Log that we're skipping this product due to missing OHLC data
             print(f"Skipping visualization for {name} - missing OHLC data")
+        
+        if len(fig.data) > first_trace_idx:
+            trace_groups[name] = list(range(first_trace_idx, len(fig.data)))
 
     # STEP 2: ADD PRODUCT CONTRIBUTION TRACES SECOND
     # First collect and sort all product contributions before adding them
@@ -1590,13 +1668,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             print(f"  {product_name}: {len(df)} data points")
 
     # Get the resolution frequency
-    freq_map = {
-        '3D': '3D',
-        '1W': 'W',
-        '2W': '2W',
-        '1M': 'M'
-    }
-    resample_freq = freq_map[resolution]
+    resample_freq = RESOLUTION_FREQ[resolution]
     print(f"Using resolution frequency: {resample_freq} for product contributions")
 
     # Step 1: Define consistent date boundaries for the 3-day windows
@@ -1645,21 +1717,16 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     )
 
     # Step 3: Calculate total value for each aligned time period
-    date_totals = {}
-    for date in consolidated_product_data:
-        total = sum(consolidated_product_data[date].values())
-        if total > 0:  # Skip dates with no data
-            date_totals[date] = total
+    date_totals = consolidated_product_data.sum(axis=1)
+    date_totals = date_totals[date_totals > 0]  # Skip dates with no data
 
     # Print debug information
     print(f"Created consolidated values for {len(date_totals)} time periods")
-    print(f"Number of products with data: {len(set().union(*[set(data.keys()) for data in consolidated_product_data.values()]))}")
+    print(f"Number of products with data: {len(consolidated_product_data.columns)}")
 
     # Step 4: Create contribution traces for each product aligned to the grid
     # We need to collect ALL products that appear anywhere in our data
-    all_product_names = set()
-    for date_data in consolidated_product_data.values():
-        all_product_names.update(date_data.keys())
+    all_product_names = consolidated_product_data.columns
 
     # Create a mapping of product names to their colors from the OHLC charts
     product_color_map = {}
@@ -1668,20 +1735,16 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             continue
         
         # Calculate the color index the same way we did for OHLC
-        color_idx = list(analyses.keys()).index(name) % len(analysis_colors)
+        color_idx = analysis_positions[name] % len(analysis_colors)
         product_color_map[name] = analysis_colors[color_idx]
         print(f"Assigned color to {name}: {analysis_colors[color_idx]}")
 
     # Now create traces for each product using our consolidated data
     for i, product_name in enumerate(all_product_names):
-        dates = []
-        values = []
-        
         # Collect all dates where this product has data
-        for date in sorted(consolidated_product_data.keys()):
-            if product_name in consolidated_product_data[date]:
-                dates.append(date)
-                values.append(consolidated_product_data[date][product_name])
+        product_values = consolidated_product_data[product_name].dropna()
+        dates = list(product_values.index)
+        values = product_values.tolist()
         
         if not dates:
             print(f"  Warning: No consolidated dates for {product_name}")
@@ -1748,48 +1811,8 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         contribution_trace_indices.append(trace_idx)  # Store the index
         print(f"  Added contribution trace for {product_name} at index {trace_idx} with color {color}")
 
-    # STEP 3: CREATE TRACE GROUPS
-    # Create a mapping of traces to their exact analysis name
-    trace_groups = {}
-
-    # First, identify all contribution traces
-    contribution_trace_indices = []
-    for i, trace in enumerate(fig.data):
-        if "$ Contribution" in trace.name:
-            contribution_trace_indices.append(i)
-
-    # Then identify all non-contribution traces and group them
-    for i, trace in enumerate(fig.data):
-        # Skip contribution traces - they're handled separately
-        if i in contribution_trace_indices:
-            continue
-            
-        # Extract the full product name from the trace name
-        trace_parts = trace.name.split()
-        
-        # For traces like "MegaMucosa OHLC" or "MegaMucosa Stick Packs OHLC"
-        # We need to determine where the product name ends and the chart type begins
-        chart_types = ["OHLC", "BB", "Volume", "RSI", "MACD", "Signal", "Hist", "MA", "Upper", "Middle", "Lower"]
-        
-        # Find where the chart type starts in the trace name
-        chart_type_index = None
-        for j, part in enumerate(trace_parts):
-            if part in chart_types:
-                chart_type_index = j
-                break
-        
-        # If we found a chart type, everything before it is the product name
-        if chart_type_index is not None:
-            product_name = " ".join(trace_parts[:chart_type_index])
-        else:
-            # Fallback - use the first part as the product name
-            product_name = trace_parts[0]
-        
-        # Add to trace groups
-        if product_name not in trace_groups:
-            trace_groups[product_name] = []
-        trace_groups[product_name].append(i)
-
+    # STEP 3: TRACE GROUPS
+    # trace_groups and contribution_trace_indices were filled in as traces were added
     print(f"\nTrace groups created: {list(trace_groups.keys())}")
     for group, indices in trace_groups.items():
         print(f"  {group}: {len(indices)} traces")
@@ -1873,10 +1896,13 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             method="update"
         ))
 
+    # Visibility mask shared by every remaining button: product contributions
+    # only; each button copies it and switches on its own traces
+    contribution_visible = np.zeros(len(fig.data), dtype=bool)
+    contribution_visible[contribution_trace_indices] = True
+
     # 2. Clear All button - hides all traces except product contributions
-    clear_visible = [False] * len(fig.data)
-    for i in contribution_trace_indices:
-        clear_visible[i] = True
+    clear_visible = contribution_visible.tolist()
         
     buttons.append(dict(
         args=[{"visible": clear_visible}],
@@ -1886,15 +1912,10 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
 
     # 3. Account Overview button - shows Account Overview traces + ALL product contributions
     if "Account Overview" in trace_groups:
-        account_visible = [False] * len(fig.data)
-        
-        # Show Account Overview traces
-        for i in trace_groups["Account Overview"]:
-            account_visible[i] = True
-        
-        # Always show ALL product contributions
-        for i in contribution_trace_indices:
-            account_visible[i] = True
+        # Show Account Overview traces, and always show ALL product contributions
+        account_visible = contribution_visible.copy()
+        account_visible[trace_groups["Account Overview"]] = True
+        account_visible = account_visible.tolist()
         
         # Use pre-calculated y-axis range for Account Overview
         if 'Account Overview' in y_axis_ranges:
@@ -1932,16 +1953,10 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         indices = trace_groups[product_name]
         print(f"  {product_name}: {len(indices)} traces")
         
-        # Create visibility array for this product
-        product_visible = [False] * len(fig.data)
-        
-        # Show this product's traces
-        for i in indices:
-            product_visible[i] = True
-            
-        # Always show ALL product contributions
-        for i in contribution_trace_indices:
-            product_visible[i] = True
+        # Show this product's traces, and always show ALL product contributions
+        product_visible = contribution_visible.copy()
+        product_visible[indices] = True
+        product_visible = product_visible.tolist()
             
         # Set up the layout updates
         layout_updates = {}
@@ -2228,21 +2243,12 @@ def analyze_product_opportunities(analyses, consolidated_product_data, account_a
     ignored_products = ["Mouth Cleaner", "Mouth Freshener"]
     
     # Calculate contribution metrics for each product
-    product_contributions = {}
-    for date_data in consolidated_product_data.values():
-        for product, value in date_data.items():
-            # Skip products that contain any of the ignored terms
-            if any(ignored_term in product for ignored_term in ignored_products):
-                continue
-                
-            if product not in product_contributions:
-                product_contributions[product] = []
-            product_contributions[product].append(value)
-    
-    # Calculate average contribution for each product
+    # Calculate average contribution for each product over the periods it has data
     avg_contributions = {
-        product: sum(values) / len(values)
-        for product, values in product_contributions.items()
+        product: values.mean()
+        for product, values in consolidated_product_data.items()
+        # Skip products that contain any of the ignored terms
+        if not any(ignored_term in product for ignored_term in ignored_products)
     }
     
     # Filter out products with very low contribution (e.g., less than 1% of max contribution)
@@ -2371,6 +2377,28 @@ def calculate_target_quantity(opp, target_value):
     # Round to nearest whole unit
     return max(0, round(quantity))
 
+def calculate_opportunity_targets(opp):
+    """
+    Calculate the conservative/balanced/aggressive order quantities for an opportunity
+    Returns None (after logging what is missing) when Bollinger Bands data is absent
+    """
+    missing = [field for field in OPPORTUNITY_BB_FIELDS if field not in opp]
+    if missing:
+        print(f"Debug: Missing BB data for {opp.get('product', 'unknown')}: {missing}")
+        return None
+    
+    # Target the correct percentile levels:
+    # Conservative = 50th percentile (bb_middle)
+    # Balanced = 70th percentile (between middle and upper)
+    # Aggressive = 100th percentile (bb_upper)
+    bb_70th = opp['bb_lower'] + (opp['bb_upper'] - opp['bb_lower']) * 0.7
+    
+    return (
+        calculate_target_quantity(opp, opp['bb_middle']),
+        calculate_target_quantity(opp, bb_70th),
+        calculate_target_quantity(opp, opp['bb_upper'])
+    )
+
 def format_account_overview(account_analysis, opportunities):
     """Generate enhanced account overview section with intuitive metrics"""
     
@@ -2737,19 +2765,142 @@ def list_available_product_images() -> list:
 
 import pandas_ta_classic as ta
 import pandas as pd
-from simple_salesforce import Salesforce, SFBulkHandler
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from plotly.subplots import make_subplots
 import plotly.express as px
 import numpy as np
+import bisect
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Per-record diagnostics go to DEBUG; run summaries are still printed
+logger = logging.getLogger(__name__)
+
+# Seconds to reuse Salesforce lookups that rarely change (account info, children)
+LOOKUP_CACHE_TTL = 600
+
+# Entries kept per memoized lookup; a long-running server sees many accounts
+LOOKUP_CACHE_MAXSIZE = 512
+
+# Product names are master data and change rarely; prices are reviewed more often
+PRODUCT_CACHE_TTL = 3600
+PRICEBOOK_CACHE_TTL = 300
+
+# Order Ids per IN list: 18-char Id plus quotes and comma, within the 20k-char WHERE limit
+ORDER_ID_BATCH_SIZE = 18000 // (18 + 3)
+
+# Product2 Ids per name-fallback query
+PRODUCT_NAME_BATCH_SIZE = 200
+
+# Worker threads for building per-product OHLCV frames
+PRODUCT_OHLCV_WORKERS = 4
+
+# Distinct input series whose pandas_ta results are kept for reuse
+INDICATOR_CACHE_SIZE = 128
+
+# Nanoseconds per day, for day arithmetic on int64 datetime views
+NS_PER_DAY = 86_400_000_000_000
+
+# Bollinger Band spectrum bar used in text reports (floor || middle || ceiling)
+BB_SPECTRUM_TEMPLATE = b'||---------------||----------------||'
+
+# RSI cut points and the ordering-openness label for each band between them
+RSI_TREND_THRESHOLDS = (30, 40, 45, 50)
+RSI_TREND_LABELS = (
+    "Very open to ordering",
+    "Open to ordering",
+    "Neutral",
+    "Resistant to ordering",
+    "Strongly resistant to ordering",
+)
+
+# Bollinger Band fields an opportunity needs for order recommendations
+OPPORTUNITY_BB_FIELDS = ('bb_lower', 'bb_middle', 'bb_upper')
+
+# Report resolution -> pandas grouping frequency
+RESOLUTION_FREQ = {
+    '3D': '3D',
+    '1W': 'W',
+    '2W': '2W',
+    '1M': 'M'
+}
+
+# Candle length per resolution (candles run period_start..period_end). Candle
+# groupers use label='left', closed='left' so weekly bins are labelled by their
+# first day like '3D' ones. Calendar months have no fixed length, so '1M'
+# candles are not supported.
+RESOLUTION_STEP = {
+    '3D': pd.Timedelta(days=3),
+    '1W': pd.Timedelta(weeks=1),
+    '2W': pd.Timedelta(weeks=2)
+}
+
+_memoized_lookups = []
+
+def ttl_memoize(ttl=LOOKUP_CACHE_TTL, cache_empty=True, key=None, maxsize=LOOKUP_CACHE_MAXSIZE):
+    """
+    Memoize a Salesforce lookup for ttl seconds, keyed on its positional args
+    (lists are keyed as tuples) or on key(*args) when given. With
+    cache_empty=False, empty results -- which the lookups also return on
+    errors -- are not cached. At most maxsize entries are kept: when full,
+    expired entries are dropped first, then the oldest.
+    """
+    def decorator(func):
+        cache = {}
+        lock = threading.Lock()
+        make_key = key or (lambda *args: tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args))
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            cache_key = make_key(*args)
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(cache_key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            value = func(*args)
+            if value or cache_empty:
+                with lock:
+                    cache.pop(cache_key, None)
+                    if len(cache) >= maxsize:
+                        for expired_key in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+                            del cache[expired_key]
+                    if len(cache) >= maxsize:
+                        del cache[next(iter(cache))]
+                    cache[cache_key] = (now + ttl, value)
+            return value
+
+        wrapper.cache_clear = cache.clear
+        _memoized_lookups.append(wrapper)
+        return wrapper
+    return decorator
+
+def clear_lookup_caches():
+    """Drop all memoized Salesforce lookups"""
+    for lookup in _memoized_lookups:
+        lookup.cache_clear()
+
+@functools.lru_cache(maxsize=INDICATOR_CACHE_SIZE)
+def _run_indicator(name, values_bytes, params):
+    return getattr(ta, name)(pd.Series(np.frombuffer(values_bytes)), **dict(params))
+
+def cached_indicator(name, series, **params):
+    """
+    Run ta.<name> on a series, reusing the result when the same values and
+    parameters were seen before (re-runs of a report, repeated product series)
+    """
+    values = series.to_numpy(dtype=np.float64)
+    result = _run_indicator(name, values.tobytes(), tuple(sorted(params.items())))
+    if result is None:
+        return None
+    return result.set_axis(series.index)
 
 def get_account_name(account_id):
-    query = f"""
-        SELECT Id, Name FROM Account WHERE Id = '{account_id}'
-    """
-    account = sf.query_all(query)
-    account_name = account['records'][0]['Name']
+    account_name = get_account_info(account_id)['name']
     
     # Clean up account name - remove (DSS) prefix if present
     if account_name.startswith('(DSS) '):
@@ -2757,14 +2908,17 @@ def get_account_name(account_id):
     
     return account_name
 
+@ttl_memoize()
 def get_account_info(account_id):
     """
     Get account name and owner username
     Returns dict with 'name' and 'owner_username' keys
     """
-    query = f"""
-        SELECT Id, Name, Owner.Username FROM Account WHERE Id = '{account_id}'
-    """
+    from simple_salesforce.format import format_soql
+    
+    query = format_soql("""
+        SELECT Id, Name, Owner.Username FROM Account WHERE Id = {}
+    """, account_id)
     account = sf.query_all(query)
     record = account['records'][0]
     
@@ -2777,30 +2931,40 @@ def get_account_info(account_id):
         'owner_username': owner_username
     }
 
+@ttl_memoize(cache_empty=False)
 def get_child_accounts(parent_account_id):
     """
     Find all child accounts that have this account as their parent.
     Uses MBL_Custom_ParentAccountId_18__c to find child accounts.
     """
-    query = f"""
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+    
+    query = format_soql("""
         SELECT 
             Id, 
             Name, 
             MBL_Is_Child_Account__c 
         FROM Account 
-        WHERE MBL_Custom_ParentAccountId_18__c = '{parent_account_id}'
+        WHERE MBL_Custom_ParentAccountId_18__c = {}
         AND MBL_Is_Child_Account__c = true
-    """
+    """, parent_account_id)
     
     try:
         child_accounts = sf.query_all(query)
         print(f"Found {len(child_accounts['records'])} child accounts")
         return child_accounts['records']
+    except SalesforceExpiredSession:
+        # Let the caller log in again rather than reporting no data
+        raise
     except Exception as e:
         print(f"Error fetching child accounts: {str(e)}")
         return []
 
 def get_account_orders(account_id, start_date=None, end_date=None):
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+    
     # Get child accounts first
     child_accounts = get_child_accounts(account_id)
     all_account_ids = [account_id] + [acc['Id'] for acc in child_accounts]
@@ -2808,12 +2972,12 @@ def get_account_orders(account_id, start_date=None, end_date=None):
     # Build date filter if dates are provided
     date_filter = ""
     if start_date:
-        date_filter += f" AND MBL_Order_Shipped_Time__c >= {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND MBL_Order_Shipped_Time__c >= {:literal}", start_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     if end_date:
-        date_filter += f" AND MBL_Order_Shipped_Time__c <= {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND MBL_Order_Shipped_Time__c <= {:literal}", end_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     
     # Create account ID filter
-    account_filter = "AccountId IN ('" + "','".join(all_account_ids) + "')"
+    account_filter = format_soql("AccountId IN {}", all_account_ids)
     
     # Modify query to include Account.Name
     query = f"""
@@ -2821,10 +2985,9 @@ def get_account_orders(account_id, start_date=None, end_date=None):
             Id, 
             MBL_Order_Shipped_Time__c, 
             TotalAmount, 
-            MBL_Total_Number_of_Products__c,
             AccountId,
             Account.Name,
-            Type
+            (SELECT Quantity, TotalPrice, UnitPrice FROM OrderItems)
         FROM Order 
         WHERE {account_filter}
         {date_filter}
@@ -2834,10 +2997,6 @@ def get_account_orders(account_id, start_date=None, end_date=None):
     try:
         orders = sf.query_all(query)
         
-        # Print summary of orders found
-        print(f"\nOrder Summary:")
-        print(f"Total orders found: {len(orders['records'])}")
-        
         # Group orders by account
         orders_by_account = {}
         for order in orders['records']:
@@ -2847,130 +3006,123 @@ def get_account_orders(account_id, start_date=None, end_date=None):
                 orders_by_account[acc_id] = {'name': acc_name, 'count': 0}
             orders_by_account[acc_id]['count'] += 1
         
-        # Print breakdown
-        for acc_id, info in orders_by_account.items():
-            print(f"  {info['name']}: {info['count']} orders")
+        # Print summary of orders found with the per-account breakdown in one write
+        summary = [f"\nOrder Summary:", f"Total orders found: {len(orders['records'])}"]
+        summary.extend(f"  {info['name']}: {info['count']} orders" for info in orders_by_account.values())
+        print("\n".join(summary))
             
         return orders['records']
         
+    except SalesforceExpiredSession:
+        # Let the caller log in again rather than reporting no data
+        raise
     except Exception as e:
         print(f"Error fetching orders: {str(e)}")
         return []
 
+def get_nested_order_quantities(orders):
+    """
+    Build the get_order_quantities mapping from the OrderItems subquery that
+    get_account_orders returns inline. Returns (order_data, missing_ids) where
+    missing_ids are orders whose nested items were truncated and need a lookup.
+    """
+    order_data = {}
+    missing_ids = []
+    for order in orders:
+        if 'OrderItems' not in order:
+            missing_ids.append(order['Id'])
+            continue
+        items = order['OrderItems']
+        if not items:
+            continue  # No line items: same as no row from the aggregate query
+        if not items.get('done', True):
+            missing_ids.append(order['Id'])
+            continue
+        records = items['records']
+        if not records:
+            continue
+        unit_prices = [float(r['UnitPrice']) for r in records if r.get('UnitPrice') is not None]
+        order_data[order['Id']] = {
+            'quantity': float(sum(r.get('Quantity') or 0 for r in records)),
+            'total_price': float(sum(r.get('TotalPrice') or 0 for r in records)),
+            'unit_price': sum(unit_prices) / len(unit_prices) if unit_prices else 0.0
+        }
+    return order_data, missing_ids
+
 def get_order_quantities(order_ids):
     """
-    Get total quantities and prices from OrderItems for given Order IDs using Bulk API
+    Get total quantities and prices from OrderItems for given Order IDs
     Returns a dictionary with quantity and price information
     """
     if not order_ids:
         return {}
     
-    # Update query to include price information
-    query = """
-        SELECT 
-            OrderId, 
-            SUM(Quantity) total_quantity,
-            SUM(TotalPrice) total_price,
-            AVG(UnitPrice) avg_unit_price
-        FROM OrderItem 
-        WHERE OrderId IN ('{}')
-        GROUP BY OrderId
-    """.format("','".join(order_ids))
-    
-    try:
-        # Execute bulk query using sf.bulk
-        job = sf.bulk.OrderItem.query(query)
-        results = list(job)
-        
-        # Create dictionary mapping Order ID to quantity and price info
-        order_data = {
-            record['OrderId']: {
+    from simple_salesforce.format import format_soql
+    
+    # Aggregate server-side, one REST query per batch; keep each IN list
+    # under SOQL's 20k-character WHERE limit
+    order_data = {}
+    
+    for i in range(0, len(order_ids), ORDER_ID_BATCH_SIZE):
+        batch_ids = order_ids[i:i + ORDER_ID_BATCH_SIZE]
+        query = format_soql("""
+            SELECT 
+                OrderId, 
+                SUM(Quantity) total_quantity,
+                SUM(TotalPrice) total_price,
+                AVG(UnitPrice) avg_unit_price
+            FROM OrderItem 
+            WHERE OrderId IN {}
+            GROUP BY OrderId
+        """, batch_ids)
+        
+        for record in sf.query_all_iter(query):
+            order_data[record['OrderId']] = {
                 'quantity': float(record['total_quantity']),
                 'total_price': float(record['total_price']),
                 'unit_price': float(record['avg_unit_price'])
             }
-            for record in results
-        }
-        
-        return order_data
-        
-    except Exception as e:
-        print(f"Bulk API Error: {str(e)}")
-        print("Falling back to regular query with batched IDs...")
-        
-        # Fallback: Process in smaller batches
-        batch_size = 100
-        order_data = {}
-        
-        for i in range(0, len(order_ids), batch_size):
-            batch_ids = order_ids[i:i + batch_size]
-            order_id_string = "','".join(batch_ids)
-            
-            query = f"""
-                SELECT 
-                    OrderId, 
-                    SUM(Quantity) total_quantity,
-                    SUM(TotalPrice) total_price,
-                    AVG(UnitPrice) avg_unit_price
-                FROM OrderItem 
-                WHERE OrderId IN ('{order_id_string}')
-                GROUP BY OrderId
-            """
-            
-            batch_results = sf.query_all(query)
-            batch_data = {
-                record['OrderId']: {
-                    'quantity': float(record['total_quantity']),
-                    'total_price': float(record['total_price']),
-                    'unit_price': float(record['avg_unit_price'])
-                }
-                for record in batch_results['records']
-            }
-            order_data.update(batch_data)
-        
-        return order_data
+    
+    return order_data
 
-def create_ohlcv_from_orders(orders, resolution='1M', ma_window=90):
+def create_ohlcv_from_orders(orders, resolution='3D', ma_window=90):
     """
     Create OHLCV DataFrame showing how orders influence the quarterly moving average
     
     Parameters:
     - orders: Salesforce order records
-    - resolution: Time period grouping ('3D', '1W', '2W', '1M')
+    - resolution: Time period grouping ('3D', '1W', '2W')
     - ma_window: Moving average window in days (default 90 for quarterly)
     """
-    freq_map = {
-        '3D': '3D',
-        '1W': 'W',
-        '2W': '2W',
-        '1M': 'M'
-    }
-    freq = freq_map[resolution]
+    freq = RESOLUTION_FREQ[resolution]
+    if resolution not in RESOLUTION_STEP:
+        raise ValueError(f"Unsupported candle resolution: {resolution}")
 
-    # Get order IDs and their quantities/prices
-    order_ids = [order['Id'] for order in orders]
-    order_data = get_order_quantities(order_ids)
+    # Get order quantities/prices from the inline OrderItems subquery; only
+    # orders without (complete) nested items need a separate lookup
+    order_data, missing_ids = get_nested_order_quantities(orders)
+    if missing_ids:
+        order_data.update(get_order_quantities(list(dict.fromkeys(missing_ids))))
     
     # Convert orders to DataFrame and sort by date
     df = pd.DataFrame(orders)
     df['MBL_Order_Shipped_Time__c'] = pd.to_datetime(df['MBL_Order_Shipped_Time__c'])
     df['TotalAmount'] = pd.to_numeric(df['TotalAmount'])
     
-    # Add quantities and prices to DataFrame
-    df['volume'] = df['Id'].map(lambda x: order_data.get(x, {}).get('quantity', 0))
-    df['unit_price'] = df['Id'].map(lambda x: order_data.get(x, {}).get('unit_price', 0))
-    df['volume'] = df['volume'].fillna(0)
-    df['unit_price'] = df['unit_price'].fillna(0)
+    # Add quantities and prices to DataFrame (orders without items get 0)
+    quantities = pd.Series({order_id: data['quantity'] for order_id, data in order_data.items()}, dtype=float)
+    unit_prices = pd.Series({order_id: data['unit_price'] for order_id, data in order_data.items()}, dtype=float)
+    df['volume'] = df['Id'].map(quantities).fillna(0)
+    df['unit_price'] = df['Id'].map(unit_prices).fillna(0)
     
     df = df.sort_values('MBL_Order_Shipped_Time__c')
     
     # Calculate daily cumulative account value
     daily_df = df.set_index('MBL_Order_Shipped_Time__c')
+    # Only TotalAmount feeds the MA; empty days sum to 0 so no fill is needed
     daily_df = daily_df.resample('D').agg({
-        'TotalAmount': 'sum',
-        'volume': 'sum',
-        'unit_price': 'mean'  # Take mean of unit price for the day
-    }).ffill()  # Forward fill unit prices
+        'TotalAmount': 'sum'
+    })
     
     # Calculate simple MA without normalization
     daily_df['MA'] = daily_df['TotalAmount'].rolling(
@@ -2987,74 +3139,54 @@ def create_ohlcv_from_orders(orders, resolution='1M', ma_window=90):
     print(f"\nFirst valid MA date: {first_valid_ma.date()}")
     
     # Group by specified frequency for candlesticks
-    grouped = df.groupby(pd.Grouper(key='MBL_Order_Shipped_Time__c', freq=freq)).agg({
-        'TotalAmount': list,
-        'volume': 'sum',
-        'unit_price': 'mean'  # Take mean of unit price for the period
-    })
+    grouped = df.groupby(pd.Grouper(key='MBL_Order_Shipped_Time__c', freq=freq, label='left', closed='left')).agg(
+        order_count=('TotalAmount', 'size'),
+        volume=('volume', 'sum'),
+        unit_price=('unit_price', 'mean')  # Take mean of unit price for the period
+    )
     
     # Initialize OHLCV DataFrame
     ohlcv = pd.DataFrame(index=grouped.index)
     ohlcv['volume'] = grouped['volume']
     ohlcv['unit_price'] = grouped['unit_price'].ffill()  # Forward fill unit prices
     
-    # Initialize is_live column (marks current open candle)
-    ohlcv['is_live'] = False
-    
     # Get the last available date with data
     last_data_date = daily_df.index[-1]
+    ma = daily_df['MA']
+    
+    # Each candle covers period_start..period_end inclusive, clipped to today for
+    # the live candle. daily_df has one row per day, so a reversed rolling window
+    # of step + 1 rows yields every candle's high/low in a single pass.
+    step = RESOLUTION_STEP[resolution]
+    reversed_ma = ma.iloc[::-1].rolling(step.days + 1, min_periods=1)
+    window_high = reversed_ma.max().iloc[::-1]
+    window_low = reversed_ma.min().iloc[::-1]
+    
+    period_starts = ohlcv.index
+    period_ends = period_starts + step
+    ma_start = ma.reindex(period_starts).to_numpy()
+    ma_end = ma.reindex(period_ends).to_numpy()
+    
+    # Current/open candle: period extends beyond available data
+    is_live = period_ends > last_data_date
+    in_range = (period_starts >= first_valid_ma) & period_starts.isin(daily_df.index)
+    live = in_range & is_live
+    closed = (
+        in_range & ~is_live
+        & (period_ends <= ma.last_valid_index())
+        & (grouped['order_count'].to_numpy() > 0)
+    )
     
-    # Process periods including current open candle
-    for idx in grouped.index:
-        if idx < first_valid_ma:
-            continue
-            
-        period_start = idx
-        period_end = idx + pd.Timedelta(freq)
-        
-        # Check if this is the current/open candle (period extends beyond available data)
-        is_current_candle = period_end > last_data_date
-        
-        if is_current_candle:
-            # LIVE CANDLE: Use current data through today
-            print(f"  📊 Including LIVE candle: {period_start.date()} - {period_end.date()} (current through {last_data_date.date()})")
-            
-            # Get all MA data from period start through today
-            period_ma = daily_df.loc[period_start:last_data_date, 'MA']
-            
-            if len(period_ma) == 0 or period_start not in daily_df.index:
-                continue
-            
-            ma_start = daily_df.loc[period_start, 'MA']
-            ma_current = daily_df['MA'].iloc[-1]  # Current MA value (today)
-            
-            # Set OHLC values using live data
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_current  # Live close value
-            ohlcv.at[idx, 'high'] = period_ma.max()
-            ohlcv.at[idx, 'low'] = period_ma.min()
-            ohlcv.at[idx, 'is_live'] = True
-            
-        else:
-            # CLOSED CANDLE: Use complete period data
-            if period_end > daily_df['MA'].last_valid_index():
-                continue
-                
-            period_orders = grouped.at[idx, 'TotalAmount']
-            if not isinstance(period_orders, list) or len(period_orders) == 0:
-                continue
-            
-            # Get MA values for closed candle
-            ma_start = daily_df.loc[period_start, 'MA']
-            ma_end = daily_df.loc[period_end, 'MA'] if period_end in daily_df.index else ma_start
-            
-            # Set OHLC values
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_end
-            period_ma = daily_df.loc[period_start:period_end, 'MA']
-            ohlcv.at[idx, 'high'] = period_ma.max()
-            ohlcv.at[idx, 'low'] = period_ma.min()
-            ohlcv.at[idx, 'is_live'] = False
+    for period_start, period_end in zip(period_starts[live], period_ends[live]):
+        print(f"  📊 Including LIVE candle: {period_start.date()} - {period_end.date()} (current through {last_data_date.date()})")
+    
+    # Set OHLC values; live candles close on the current MA value (today)
+    ohlcv['is_live'] = live
+    ohlcv['open'] = ma_start
+    ohlcv['close'] = np.where(live, ma.iloc[-1], np.where(period_ends.isin(daily_df.index), ma_end, ma_start))
+    ohlcv['high'] = window_high.reindex(period_starts).to_numpy()
+    ohlcv['low'] = window_low.reindex(period_starts).to_numpy()
+    ohlcv = ohlcv[live | closed]
     
     # Remove any periods without valid data
     ohlcv = ohlcv.dropna(subset=['open', 'close', 'high', 'low'])
@@ -3091,8 +3223,8 @@ def calculate_indicators(df, MA_length=20):
     # Add indicator columns only if we have enough data
     if len(df) >= MA_length:
         try:
-            df[f'sma_{MA_length}'] = ta.sma(df['close'], length=MA_length)
-            df[f'ema_{MA_length}'] = ta.ema(df['close'], length=MA_length)
+            df[f'sma_{MA_length}'] = cached_indicator('sma', df['close'], length=MA_length)
+            df[f'ema_{MA_length}'] = cached_indicator('ema', df['close'], length=MA_length)
         except Exception as e:
             print(f"Warning: Could not calculate MA indicators: {str(e)}")
     
@@ -3100,7 +3232,7 @@ def calculate_indicators(df, MA_length=20):
     if len(df) >= 20:
         try:
             # Match simple_report_app exactly: use std=2.0 parameter
-            bbands = ta.bbands(df['close'], length=20, std=2.0)
+            bbands = cached_indicator('bbands', df['close'], length=20, std=2.0)
             if bbands is not None and not bbands.empty:
                 # pandas_ta 0.3.14b0 returns columns with _2.0_2.0 suffix when std=2.0 is used
                 # Try the expected column names first, then fall back to actual returned names
@@ -3134,13 +3266,20 @@ def calculate_indicators(df, MA_length=20):
                 
                 # Get the last 90 periods for simulation
                 close_values = df['close'].iloc[-90:].values
-                current_ma = np.mean(close_values)
                 
-                # Function to simulate next period's MA only
-                def simulate_next_period(values):
-                    new_values = np.append(values[1:], 0)  # Remove oldest, add 0
-                    new_ma = np.mean(new_values)
-                    return new_values, new_ma
+                # MA after k zero-order periods is sum(close_values[k:]) / n, so one
+                # reversed cumsum gives every decayed MA at once (0 once all values are gone)
+                max_periods = 90  # Maximum 90 3-day periods
+                n_values = len(close_values)
+                tail_sums = close_values[::-1].cumsum()[::-1]
+                decayed_mas = np.zeros(max_periods)
+                steps = min(n_values - 1, max_periods)
+                decayed_mas[:steps] = tail_sums[1:steps + 1] / n_values
+                
+                def periods_until(band):
+                    # Index of the first decayed MA at or below the band, else max_periods
+                    hits = np.flatnonzero(decayed_mas <= band)
+                    return int(hits[0]) if hits.size else max_periods
                 
                 # Initialize simulation results
                 df['days_until_lower_breach'] = 0
@@ -3148,31 +3287,11 @@ def calculate_indicators(df, MA_length=20):
                 
                 # Simulate for lower band if above it
                 if latest_close > latest_bb_lower:
-                    simulation_values = close_values.copy()
-                    periods = 0
-                    max_periods = 90  # Maximum 90 3-day periods
-                    
-                    while periods < max_periods:
-                        simulation_values, new_ma = simulate_next_period(simulation_values)
-                        if new_ma <= latest_bb_lower:
-                            break
-                        periods += 1
-                    
-                    df['days_until_lower_breach'] = periods * 3  # Convert to days
+                    df['days_until_lower_breach'] = periods_until(latest_bb_lower) * 3  # Convert to days
                 
                 # Simulate for middle band if above it
                 if latest_close > latest_bb_middle:
-                    simulation_values = close_values.copy()
-                    periods = 0
-                    max_periods = 90  # Maximum 90 3-day periods
-                    
-                    while periods < max_periods:
-                        simulation_values, new_ma = simulate_next_period(simulation_values)
-                        if new_ma <= latest_bb_middle:
-                            break
-                        periods += 1
-                    
-                    df['days_until_middle_breach'] = periods * 3  # Convert to days
+                    df['days_until_middle_breach'] = periods_until(latest_bb_middle) * 3  # Convert to days
             elif bbands is None:
                 print(f"Debug: ta.bbands() returned None for {len(df)} data points")
             elif bbands.empty:
@@ -3185,16 +3304,16 @@ def calculate_indicators(df, MA_length=20):
     # RSI - requires at least 14 points
     if len(df) >= 14:
         try:
-            df['rsi'] = ta.rsi(df['close'], length=14)
+            df['rsi'] = cached_indicator('rsi', df['close'], length=14)
             if len(df) >= 28:  # Need at least 28 points for RSI MA
-                df['rsi_ma'] = ta.sma(df['rsi'], length=14)
+                df['rsi_ma'] = cached_indicator('sma', df['rsi'], length=14)
         except Exception as e:
             print(f"Warning: Could not calculate RSI: {str(e)}")
     
     # MACD - requires at least 26 points
     if len(df) >= 26:
         try:
-            macd = ta.macd(df['close'])
+            macd = cached_indicator('macd', df['close'])
             if macd is not None:
                 df['macd'] = macd['MACD_12_26_9']
                 df['macd_signal'] = macd['MACDs_12_26_9']
@@ -3211,17 +3330,19 @@ def get_account_order_products(account_id, start_date=None, end_date=None):
     """
     Get OrderItem records with product details for an account with cascading product name fallbacks
     """
+    from simple_salesforce.format import format_soql
+    
     date_filter = ""
     if start_date:
-        date_filter += f" AND Order.MBL_Order_Shipped_Time__c >= {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND Order.MBL_Order_Shipped_Time__c >= {:literal}", start_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     if end_date:
-        date_filter += f" AND Order.MBL_Order_Shipped_Time__c <= {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        date_filter += format_soql(" AND Order.MBL_Order_Shipped_Time__c <= {:literal}", end_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    
+    account_filter = format_soql("Order.AccountId = {}", account_id)
     
     query = f"""
         SELECT 
-            Id,
             Order.MBL_Order_Shipped_Time__c,
-            Order.TotalAmount,
             Product2Id,
             Product_Name__c,
             Product2.Name,
@@ -3230,70 +3351,81 @@ def get_account_order_products(account_id, start_date=None, end_date=None):
             TotalPrice,
             UnitPrice
         FROM OrderItem 
-        WHERE Order.AccountId = '{account_id}'
+        WHERE {account_filter}
         {date_filter}
         ORDER BY Order.MBL_Order_Shipped_Time__c ASC
     """
     order_products = sf.query_all(query)
     
-    # Apply cascading product name fallback logic to each record
+    # Apply cascading product name fallback logic to each record. Items of the
+    # same product repeat the same name fields, so each distinct combination is
+    # resolved (and reported) once.
+    resolved_names = {}
     for record in order_products['records']:
-        product_name = (record.get('Product_Name__c') or '').strip()
-        product2_name = ''
-        product2_code = ''
-        
-        if record.get('Product2'):
-            product2_name = (record['Product2'].get('Name') or '').strip()
-            product2_code = (record['Product2'].get('ProductCode') or '').strip()
-        
-        # Use Product_Name__c if available and non-empty
-        if product_name:
-            final_name = product_name
-        # Otherwise try Product2.Name
-        elif product2_name:
-            final_name = product2_name
-            print(f"  ℹ Using Product2.Name for Product2Id {record['Product2Id']}: {final_name}")
-        # Last resort: use ProductCode
-        elif product2_code:
-            final_name = product2_code
-            print(f"  ⚠ Using ProductCode for Product2Id {record['Product2Id']}: {final_name}")
-        else:
-            final_name = f"Unknown Product ({record['Product2Id']})"
-            print(f"  ✗ No name found for Product2Id {record['Product2Id']}")
+        product2 = record.get('Product2') or {}
+        name_fields = (record['Product2Id'], record.get('Product_Name__c'),
+                       product2.get('Name'), product2.get('ProductCode'))
+        final_name = resolved_names.get(name_fields)
+        
+        if final_name is None:
+            product_id = name_fields[0]
+            product_name, product2_name, product2_code = ((value or '').strip() for value in name_fields[1:])
+            
+            # Use Product_Name__c if available and non-empty
+            if product_name:
+                final_name = product_name
+            # Otherwise try Product2.Name
+            elif product2_name:
+                final_name = product2_name
+                logger.debug("Using Product2.Name for Product2Id %s: %s", product_id, final_name)
+            # Last resort: use ProductCode
+            elif product2_code:
+                final_name = product2_code
+                logger.debug("Using ProductCode for Product2Id %s: %s", product_id, final_name)
+            else:
+                final_name = f"Unknown Product ({product_id})"
+                logger.debug("No name found for Product2Id %s", product_id)
+            resolved_names[name_fields] = final_name
         
         # Update the record with the final name
         record['Product_Name__c'] = final_name
     
     return order_products['records']
 
-def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=90, pricebook_prices=None):
+def index_order_products(order_products):
+    """
+    Flatten OrderItem records into one DataFrame and split it by Product2Id
+    Returns dict mapping Product2Id to a DataFrame with date, TotalPrice, Quantity and UnitPrice columns
+    """
+    if not order_products:
+        return {}
+    
+    # Pull the nested Order fields out in one pass instead of once per product
+    df = pd.DataFrame({
+        'Product2Id': [item['Product2Id'] for item in order_products],
+        'date': pd.to_datetime([item['Order']['MBL_Order_Shipped_Time__c'] for item in order_products]),
+        'TotalPrice': pd.to_numeric([item['TotalPrice'] for item in order_products]),
+        'Quantity': pd.to_numeric([item['Quantity'] for item in order_products]),
+        'UnitPrice': [item['UnitPrice'] for item in order_products],
+    })
+    
+    return {product_id: group for product_id, group in df.groupby('Product2Id', sort=False)}
+
+def create_product_ohlcv(product_frame, product_id, resolution='3D', ma_window=90, pricebook_prices=None):
     """
     Create OHLCV DataFrame for a specific product
     
     Args:
-        order_products: List of OrderItem records
-        product_id: Product2Id to filter for
-        resolution: Time period grouping ('3D', '1W', '2W', '1M')
+        product_frame: The product's order items, as returned by index_order_products
+        product_id: Product2Id of the product
+        resolution: Time period grouping ('3D', '1W', '2W')
         ma_window: Moving average window in days
         pricebook_prices: Dict mapping Product2Id to current pricebook unit price (optional)
     """
-    # Filter for specific product
-    product_orders = [
-        order for order in order_products 
-        if order['Product2Id'] == product_id
-    ]
-    
-    if not product_orders:
+    if product_frame is None or product_frame.empty:
         return None
     
-    # Convert to DataFrame
-    df = pd.DataFrame(product_orders)
-    
-    # Extract nested Order fields
-    df['date'] = pd.to_datetime([order['Order']['MBL_Order_Shipped_Time__c'] for order in product_orders])
-    df['OrderTotalAmount'] = [order['Order']['TotalAmount'] for order in product_orders]
-    df['TotalPrice'] = pd.to_numeric(df['TotalPrice'])
-    df['Quantity'] = pd.to_numeric(df['Quantity'])
+    df = product_frame.copy()
     
     # Determine unit price to use
     if pricebook_prices and product_id in pricebook_prices:
@@ -3313,9 +3445,9 @@ def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=
     # Resample to daily and fill gaps
     daily_df = df.set_index('date').resample('D').agg({
         'TotalPrice': 'sum',
-        'Quantity': 'sum',
         'UnitPrice': 'mean'  # Keep consistent unit price
-    }).ffill()  # Forward fill unit prices
+    })
+    daily_df['UnitPrice'] = daily_df['UnitPrice'].ffill()  # Forward fill unit prices
     
     # Calculate simple MA without normalization
     daily_df['MA'] = daily_df['TotalPrice'].rolling(
@@ -3329,80 +3461,49 @@ def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=
         return None  # Not enough data
     
     # Group by resolution
-    freq_map = {
-        '3D': '3D',
-        '1W': 'W',
-        '2W': '2W',
-        '1M': 'M'
-    }
-    freq = freq_map[resolution]
+    freq = RESOLUTION_FREQ[resolution]
+    if resolution not in RESOLUTION_STEP:
+        raise ValueError(f"Unsupported candle resolution: {resolution}")
     
-    grouped = df.groupby(pd.Grouper(key='date', freq=freq)).agg({
-        'TotalPrice': list,
+    grouped = df.groupby(pd.Grouper(key='date', freq=freq, label='left', closed='left')).agg({
         'Quantity': 'sum'
     })
     
     # Create OHLCV DataFrame
     ohlcv = pd.DataFrame(index=grouped.index)
     ohlcv['volume'] = grouped['Quantity']
-    ohlcv['unit_price'] = daily_df['UnitPrice'].resample(freq).mean().ffill()
-    
-    # Initialize is_live column (marks current open candle)
-    ohlcv['is_live'] = False
+    ohlcv['unit_price'] = daily_df['UnitPrice'].resample(freq, label='left', closed='left').mean()  # Daily prices are already filled
     
     # Get the last available date with data
     last_data_date = daily_df.index[-1]
-    
-    # Calculate OHLC values including current open candle
-    for idx in grouped.index:
-        if idx < first_valid_ma:
-            continue
-            
-        period_start = idx
-        period_end = idx + pd.Timedelta(freq)
-        
-        # Check if period start is valid
-        if period_start not in daily_df.index:
-            continue
-        
-        # Check if this is the current/open candle
-        is_current_candle = period_end > last_data_date
-        
-        if is_current_candle:
-            # LIVE CANDLE: Use current data through today
-            period_data = daily_df.loc[period_start:last_data_date, 'MA']
-            
-            if len(period_data) < 1:
-                continue
-            
-            ma_start = period_data.iloc[0]
-            ma_current = daily_df['MA'].iloc[-1]  # Current MA value
-            
-            # Set OHLC values using live data
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_current  # Live close value
-            ohlcv.at[idx, 'high'] = period_data.max()
-            ohlcv.at[idx, 'low'] = period_data.min()
-            ohlcv.at[idx, 'is_live'] = True
-            
-        else:
-            # CLOSED CANDLE: Use complete period data
-            if period_end > daily_df.index[-1]:
-                continue
-                
-            # Get MA values - handle case where we might not have enough data points
-            period_data = daily_df.loc[period_start:period_end, 'MA']
-            if len(period_data) < 2:
-                continue
-                
-            ma_start = period_data.iloc[0]
-            ma_end = period_data.iloc[-1]
-            
-            ohlcv.at[idx, 'open'] = ma_start
-            ohlcv.at[idx, 'close'] = ma_end
-            ohlcv.at[idx, 'high'] = period_data.max()
-            ohlcv.at[idx, 'low'] = period_data.min()
-            ohlcv.at[idx, 'is_live'] = False
+    ma = daily_df['MA']
+    
+    # Candles cover period_start..period_end inclusive (clipped to today when
+    # live); reversed rolling windows over the daily MA give all highs/lows at once
+    step = RESOLUTION_STEP[resolution]
+    window = step.days + 1
+    reversed_ma = ma.iloc[::-1].rolling(window, min_periods=1)
+    window_high = reversed_ma.max().iloc[::-1]
+    window_low = reversed_ma.min().iloc[::-1]
+    window_count = reversed_ma.count().iloc[::-1]
+    
+    period_starts = ohlcv.index
+    period_ends = period_starts + step
+    
+    # Current/open candle: period extends beyond available data. Closed candles
+    # need at least two valid daily MA points in their window.
+    is_live = period_ends > last_data_date
+    in_range = (period_starts >= first_valid_ma) & period_starts.isin(daily_df.index)
+    live = in_range & is_live
+    closed = in_range & ~is_live & (window_count.reindex(period_starts).to_numpy() >= 2)
+    
+    # Set OHLC values; live candles close on the current MA value
+    ohlcv['is_live'] = live
+    ohlcv['open'] = ma.reindex(period_starts).to_numpy()
+    ohlcv['close'] = np.where(live, ma.iloc[-1], ma.reindex(period_ends).to_numpy())
+    ohlcv['high'] = window_high.reindex(period_starts).to_numpy()
+    ohlcv['low'] = window_low.reindex(period_starts).to_numpy()
+    ohlcv = ohlcv[live | closed]
     
     ohlcv = ohlcv.dropna()
     
@@ -3411,6 +3512,7 @@ def create_product_ohlcv(order_products, product_id, resolution='3D', ma_window=
     
     return ohlcv
 
+@ttl_memoize(ttl=PRICEBOOK_CACHE_TTL, cache_empty=False)
 def get_pricebook_prices(product_ids):
     """
     Get current unit prices from Pricebook for given Product2Ids
@@ -3421,28 +3523,18 @@ def get_pricebook_prices(product_ids):
     
     print(f"\n🔍 Fetching pricebook prices for {len(product_ids)} products...")
     
-    # First, get the standard pricebook ID
-    try:
-        std_pricebook = sf.query("SELECT Id FROM Pricebook2 WHERE IsStandard = true LIMIT 1")
-        if not std_pricebook['records']:
-            print("  ⚠️  Warning: No standard pricebook found, falling back to historical prices")
-            return {}
-        
-        pricebook_id = std_pricebook['records'][0]['Id']
-        print(f"  Using Standard Pricebook: {pricebook_id}")
-    except Exception as e:
-        print(f"  ⚠️  Error getting standard pricebook: {str(e)}")
-        return {}
+    # Query standard PricebookEntry rows for all products; filtering on the
+    # Pricebook2 relationship saves a separate standard pricebook lookup
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
     
-    # Query PricebookEntry for all products
-    product_id_list = "','".join(product_ids)
-    query = f"""
+    query = format_soql("""
         SELECT Product2Id, UnitPrice, IsActive, Product2.Name
         FROM PricebookEntry
-        WHERE Pricebook2Id = '{pricebook_id}'
-        AND Product2Id IN ('{product_id_list}')
+        WHERE Pricebook2.IsStandard = true
+        AND Product2Id IN {}
         AND IsActive = true
-    """
+    """, list(product_ids))
     
     try:
         results = sf.query_all(query)
@@ -3453,7 +3545,7 @@ def get_pricebook_prices(product_ids):
             unit_price = float(record['UnitPrice'])
             product_name = record['Product2']['Name'] if record.get('Product2') else 'Unknown'
             price_map[product_id] = unit_price
-            print(f"  ✓ {product_name}: ${unit_price:.2f}")
+            logger.debug("Pricebook price %s: $%.2f", product_name, unit_price)
         
         # Report any products not found in pricebook
         missing = set(product_ids) - set(price_map.keys())
@@ -3463,25 +3555,35 @@ def get_pricebook_prices(product_ids):
         print(f"  ✓ Found pricebook prices for {len(price_map)}/{len(product_ids)} products\n")
         return price_map
         
+    except SalesforceExpiredSession:
+        # Let the caller log in again rather than reporting no data
+        raise
     except Exception as e:
         print(f"  ⚠️  Error querying pricebook entries: {str(e)}")
         return {}
 
+# Keyed by calendar day: callers pass datetime.now()-based bounds, which would
+# otherwise never repeat
+@ttl_memoize(ttl=PRODUCT_CACHE_TTL, cache_empty=False,
+             key=lambda account_id, start_date, end_date: (account_id, start_date.date(), end_date.date()))
 def get_account_products(account_id, start_date, end_date):
     """
     Get unique products ordered by an account with full product name fallbacks
     """
-    query = f"""
+    from simple_salesforce.format import format_soql
+    from simple_salesforce.exceptions import SalesforceExpiredSession
+    
+    query = format_soql("""
         SELECT 
             Product2Id,
             Product_Name__c,
             Product2.Name,
             Product2.ProductCode
         FROM OrderItem 
-        WHERE Order.AccountId = '{account_id}'
-        AND Order.MBL_Order_Shipped_Time__c >= {start_date.strftime('%Y-%m-%dT%H:%M:%SZ')}
-        AND Order.MBL_Order_Shipped_Time__c <= {end_date.strftime('%Y-%m-%dT%H:%M:%SZ')}
-    """
+        WHERE Order.AccountId = {}
+        AND Order.MBL_Order_Shipped_Time__c >= {:literal}
+        AND Order.MBL_Order_Shipped_Time__c <= {:literal}
+    """, account_id, start_date.strftime('%Y-%m-%dT%H:%M:%SZ'), end_date.strftime('%Y-%m-%dT%H:%M:%SZ'))
     products = sf.query_all(query)
     
     # Create dictionary of unique products with cascading name fallback
@@ -3493,53 +3595,63 @@ def get_account_products(account_id, start_date, end_date):
             product_name = (record.get('Product_Name__c') or '').strip()
             
             # Debug output for each product
-            print(f"Debug: Product2Id {product_id}")
-            print(f"  - Product_Name__c: '{record.get('Product_Name__c')}'")
-            print(f"  - Product2: {record.get('Product2')}")
+            logger.debug("Product2Id %s: Product_Name__c=%r, Product2=%s",
+                         product_id, record.get('Product_Name__c'), record.get('Product2'))
             
             # If Product_Name__c is empty, try Product2.Name
             if not product_name and record.get('Product2'):
                 product_name = (record['Product2'].get('Name') or '').strip()
                 if product_name:
-                    print(f"  ✓ Using Product2.Name: {product_name}")
+                    logger.debug("Using Product2.Name: %s", product_name)
             
             # If still empty, try Product2.ProductCode
             if not product_name and record.get('Product2'):
                 product_name = (record['Product2'].get('ProductCode') or '').strip()
                 if product_name:
-                    print(f"  ⚠ Using ProductCode: {product_name}")
-            
-            # Last resort - query Product2 directly from Salesforce
-            if not product_name:
-                print(f"  ⚠ All name fields empty, querying Product2 directly...")
-                try:
-                    product_direct = sf.query(f"SELECT Name, ProductCode, Description FROM Product2 WHERE Id = '{product_id}'")
-                    if product_direct['records']:
-                        prod_record = product_direct['records'][0]
-                        product_name = (prod_record.get('Name') or '').strip()
-                        if not product_name:
-                            product_name = (prod_record.get('ProductCode') or '').strip()
-                        if not product_name:
-                            product_name = (prod_record.get('Description') or '').strip()
-                        if product_name:
-                            print(f"  ✓ Retrieved from Product2 direct query: {product_name}")
-                except Exception as e:
-                    print(f"  ✗ Error querying Product2 directly: {str(e)}")
-            
-            # Final fallback
-            if not product_name:
-                product_name = f'Unknown Product ({product_id})'
-                print(f"  ✗ No name found, using: {product_name}")
+                    logger.debug("Using ProductCode: %s", product_name)
             
+            # Empty names are looked up from Product2 below
             unique_products[product_id] = product_name
     
+    # Last resort - query Product2 directly from Salesforce, batched for all
+    # products whose name fields were empty
+    missing_ids = [product_id for product_id, product_name in unique_products.items() if not product_name]
+    if missing_ids:
+        print(f"  ⚠ All name fields empty for {len(missing_ids)} products, querying Product2 directly...")
+        for i in range(0, len(missing_ids), PRODUCT_NAME_BATCH_SIZE):
+            batch_ids = missing_ids[i:i + PRODUCT_NAME_BATCH_SIZE]
+            try:
+                for prod_record in sf.query_all_iter(format_soql(
+                        "SELECT Id, Name, ProductCode, Description FROM Product2 WHERE Id IN {}", batch_ids)):
+                    product_name = (prod_record.get('Name') or '').strip()
+                    if not product_name:
+                        product_name = (prod_record.get('ProductCode') or '').strip()
+                    if not product_name:
+                        product_name = (prod_record.get('Description') or '').strip()
+                    if product_name and prod_record['Id'] in unique_products:
+                        unique_products[prod_record['Id']] = product_name
+                        logger.debug("Retrieved from Product2 direct query: %s", product_name)
+            except SalesforceExpiredSession:
+                # Let the caller log in again rather than reporting no data
+                raise
+            except Exception as e:
+                print(f"  ✗ Error querying Product2 directly: {str(e)}")
+    
+    # Final fallback
+    for product_id in missing_ids:
+        if not unique_products[product_id]:
+            unique_products[product_id] = f'Unknown Product ({product_id})'
+            print(f"  ✗ No name found, using: {unique_products[product_id]}")
+    
     print(f"\nFound {len(unique_products)} unique products for account")
     return unique_products
 
 def consolidate_product_data(analyses, resolution_freq, analysis_start_date, end_date_timestamp):
     """
     Consolidate all product data to ensure consistent time periods across all products.
-    Returns a dictionary of {date: {product_name: value}}
+    Returns a DataFrame indexed by date with one column of close values per product
+    (NaN before the product's first period). Columns are ordered by first period,
+    then by their order in analyses.
     """
     # Create a uniform date range
     consolidated_range = pd.date_range(
@@ -3548,34 +3660,36 @@ def consolidate_product_data(analyses, resolution_freq, analysis_start_date, end
         freq=resolution_freq
     )
     
-    # Initialize the consolidated data structure
-    consolidated_data = {date: {} for date in consolidated_range}
+    products = [
+        (product_name, df) for product_name, df in analyses.items()
+        if product_name != 'Account Overview' and df is not None and not df.empty
+    ]
+    
+    # One contiguous float column per product
+    values = np.full((len(consolidated_range), len(products)), np.nan)
+    first_rows = np.full(len(products), len(consolidated_range))
     
     # Process each product's data
-    for product_name, df in analyses.items():
-        if product_name == 'Account Overview' or df is None or df.empty:
-            continue
-            
+    for column, (product_name, df) in enumerate(products):
         print(f"Consolidating data for {product_name}: {len(df)} original data points")
         
-        # For each date in our consolidated range, find the matching product value
-        for target_date in consolidated_range:
-            if target_date in df.index:
-                # Direct match
-                consolidated_data[target_date][product_name] = df.loc[target_date, 'close']
-            else:
-                # Find the most recent value before this date
-                mask = df.index <= target_date
-                if mask.any():
-                    latest_value = df[mask]['close'].iloc[-1]
-                    consolidated_data[target_date][product_name] = latest_value
-    
-    # Count unique products for debugging
-    all_products = set()
-    for date_data in consolidated_data.values():
-        all_products.update(date_data.keys())
+        # For each date in our consolidated range, take the value on that date or
+        # the most recent one before it; -1 marks dates before the product's first period
+        positions = df.index.get_indexer(consolidated_range, method='pad')
+        found = positions >= 0
+        values[found, column] = df['close'].to_numpy(dtype=np.float64)[positions[found]]
+        if found.any():
+            first_rows[column] = found.argmax()
+    
+    # Keep products with at least one consolidated value, earliest first
+    order = [column for column in np.argsort(first_rows, kind='stable') if first_rows[column] < len(consolidated_range)]
+    consolidated_data = pd.DataFrame(
+        values[:, order],
+        index=consolidated_range,
+        columns=[products[column][0] for column in order]
+    )
     
-    print(f"Consolidated data includes {len(all_products)} unique products")
+    print(f"Consolidated data includes {len(consolidated_data.columns)} unique products")
     
     return consolidated_data
 
@@ -3587,52 +3701,42 @@ def calculate_average_order_interval(df):
     if df is None or df.empty or 'volume' not in df.columns:
         return None
     
-    # Get dates where volume > 0 (actual orders)
-    order_dates = df[df['volume'] > 0].index
-    if len(order_dates) < 2:
+    # Get dates where volume > 0 (actual orders) as int64 nanoseconds
+    order_ns = df.index[df['volume'].to_numpy() > 0].as_unit('ns').asi8
+    if len(order_ns) < 2:
         return None
     
-    # Calculate differences between consecutive orders
-    intervals = np.diff(order_dates)
-    avg_interval = np.mean(intervals)
-    
-    # Convert timedelta to days
-    return avg_interval.days
+    # The mean gap between consecutive orders telescopes to (last - first) / (n - 1);
+    # floor division gives whole days like Timedelta.days
+    return int((order_ns[-1] - order_ns[0]) // ((len(order_ns) - 1) * NS_PER_DAY))
 
 def get_trend_description(current_rsi):
     """
     Get a plain language description of the RSI trend
     """
-    if current_rsi < 30:
-        return "Very open to ordering"
-    elif current_rsi < 40:
-        return "Open to ordering"
-    elif current_rsi < 45:
-        return "Neutral"
-    elif current_rsi < 50:
-        return "Resistant to ordering"
-    else:
-        return "Strongly resistant to ordering"
+    return RSI_TREND_LABELS[bisect.bisect_right(RSI_TREND_THRESHOLDS, current_rsi)]
+
+def format_report_date(d):
+    """
+    Format a date as YYYY.MM.DD for the opportunity report
+    """
+    return f"{d.year:04d}.{d.month:02d}.{d.day:02d}"
 
 def create_bb_spectrum(position_in_band):
     """
     Create a visual spectrum representation of position within Bollinger Bands
     Returns a string with wider spacing to match the key format
     """
-    # Create a wider spectrum with more dashes
-    spectrum = list('||---------------||----------------||')
-    
     if position_in_band < 0:  # Below floor
-        spectrum.insert(0, 'x')
-    elif position_in_band > 100:  # Above ceiling
-        spectrum.append('x')
-    else:
-        # Calculate position in the wider spectrum (now with more positions)
-        # We have 31 possible positions (15 dashes in each section + the dividers)
-        pos = int(2 + (position_in_band / 100.0 * 31))
-        spectrum[pos] = 'x'
-    
-    return ''.join(spectrum)
+        return 'x' + BB_SPECTRUM_TEMPLATE.decode('ascii')
+    if position_in_band > 100:  # Above ceiling
+        return BB_SPECTRUM_TEMPLATE.decode('ascii') + 'x'
+
+    # Calculate position in the wider spectrum (now with more positions)
+    # We have 31 possible positions (15 dashes in each section + the dividers)
+    spectrum = bytearray(BB_SPECTRUM_TEMPLATE)
+    spectrum[int(2 + (position_in_band / 100.0 * 31))] = ord('x')
+    return spectrum.decode('ascii')
 
 def calculate_order_recommendations(opp):
     """
@@ -3644,18 +3748,21 @@ def calculate_order_recommendations(opp):
     bb_middle = opp['bb_middle']
     bb_upper = opp['bb_upper']
     
+    # Accept either a list or an ndarray of volumes
+    volume = np.asarray(opp['volume'], dtype=np.float64)
+    
     # Get the product's average price per unit from recent orders
-    recent_volume = sum(opp['volume'][-14:])  # Last 14 periods
+    recent_volume = volume[-14:].sum()  # Last 14 periods
     if recent_volume == 0:
         return None  # Can't calculate without recent order data
         
-    recent_value = sum(opp['volume'][-14:] * opp['current_close'])
+    recent_value = recent_volume * current_value
     avg_price_per_unit = recent_value / recent_volume
     
     # Calculate how many days until value drops below lower band
     if current_value > bb_lower:
         # Use the average daily decline rate from the last period
-        daily_decline = (opp['volume'][0] - opp['volume'][-1]) / len(opp['volume'])
+        daily_decline = (volume[0] - volume[-1]) / len(volume)
         if daily_decline > 0:
             days_until_lower = (current_value - bb_lower) / daily_decline
         else:
@@ -3710,8 +3817,15 @@ def format_opportunity_report(opportunities, account_analysis=None):
     - account_analysis: Account overview DataFrame with indicators (optional)
     """
     try:
+        # One clock read for the whole report so every product is bucketed
+        # against the same moment
+        now = datetime.now()
+        
         report = ["Product Sales Opportunity Report"]
-        report.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        report.append(
+            f"Generated on: {now.year:04d}-{now.month:02d}-{now.day:02d} "
+            f"{now.hour:02d}:{now.minute:02d}:{now.second:02d}"
+        )
         
         # Add the report legend
         report.append("\n" + "=" * 80 + "\n")
@@ -3743,26 +3857,29 @@ def format_opportunity_report(opportunities, account_analysis=None):
             report.append("No priority opportunities found matching criteria.\n")
             return "\n".join(report)
 
-        # Group opportunities by workweek based on next order date
+        # Group opportunities by workweek based on next order date.
+        # Weeks are keyed by their Monday; the label is formatted once per week.
         order_weeks = {}
         for opp in opportunities:
             if opp.get('order_interval'):
-                next_order_date = datetime.now() + timedelta(days=opp['order_interval'])
-                days_until_monday = (next_order_date.weekday()) % 7
-                week_start = next_order_date - timedelta(days=days_until_monday)
-                week_end = week_start + timedelta(days=4)  # End on Friday
-                week_key = f"{week_start.strftime('%Y.%m.%d')} - {week_end.strftime('%Y.%m.%d')}"
+                next_order_date = now + timedelta(days=opp['order_interval'])
+                week_key = next_order_date.date() - timedelta(days=next_order_date.weekday())
                 
                 if week_key not in order_weeks:
+                    week_start = next_order_date - timedelta(days=next_order_date.weekday())
+                    week_end = week_start + timedelta(days=4)  # End on Friday
                     order_weeks[week_key] = {
                         'products': [],
                         'conservative': 0,
                         'balanced': 0,
                         'aggressive': 0,
                         'start_date': week_start,
-                        'end_date': week_end
+                        'end_date': week_end,
+                        'label': f"{format_report_date(week_start)} - {format_report_date(week_end)}",
+                        'targets': []
                     }
                 order_weeks[week_key]['products'].append(opp)
+                order_weeks[week_key]['targets'].append(calculate_opportunity_targets(opp))
 
         # Sort weeks chronologically
         sorted_week_keys = sorted(order_weeks.keys())
@@ -3772,59 +3889,40 @@ def format_opportunity_report(opportunities, account_analysis=None):
             week_data = order_weeks[week_key]
             week_products = week_data['products']
             
-            # Calculate total recommended values for this week
-            for opp in week_products:
-                # Debug: Check for missing Bollinger Bands data
-                if 'bb_upper' not in opp or 'bb_lower' not in opp or 'bb_middle' not in opp:
-                    print(f"Debug: Missing BB data in week calculation for {opp.get('product', 'unknown')}")
-                    print(f"  Available keys: {list(opp.keys())}")
-                    print(f"  Has bb_upper: {'bb_upper' in opp}")
-                    print(f"  Has bb_lower: {'bb_lower' in opp}")
-                    print(f"  Has bb_middle: {'bb_middle' in opp}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
-                
-                # Target the correct percentile levels:
-                # Conservative = 50th percentile (bb_middle)
-                # Balanced = 70th percentile (between middle and upper)
-                # Aggressive = 100th percentile (bb_upper)
-                bb_70th = opp['bb_lower'] + (opp['bb_upper'] - opp['bb_lower']) * 0.7
-                
-                cons_qty = calculate_target_quantity(opp, opp['bb_middle'])
-                bal_qty = calculate_target_quantity(opp, bb_70th)
-                agg_qty = calculate_target_quantity(opp, opp['bb_upper'])
-                
-                week_data['conservative'] += cons_qty * opp['unit_price']
-                week_data['balanced'] += bal_qty * opp['unit_price']
-                week_data['aggressive'] += agg_qty * opp['unit_price']
+            # Calculate total recommended values for this week:
+            # (products x [cons, bal, agg]) quantities dotted with unit prices
+            priced = [
+                (opp['unit_price'], targets)
+                for opp, targets in zip(week_products, week_data['targets'])
+                if targets is not None
+            ]
+            if priced:
+                prices = np.array([price for price, _ in priced], dtype=np.float64)
+                quantities = np.array([targets for _, targets in priced], dtype=np.float64)
+                week_data['conservative'], week_data['balanced'], week_data['aggressive'] = (
+                    float(total) for total in prices @ quantities
+                )
             
             # Add week header with value ranges
-            report.append(f"ORDER WEEK: {week_key}")
+            report.append(f"ORDER WEEK: {week_data['label']}")
             report.append(f"Value Range: [${week_data['conservative']:,.0f} < ${week_data['balanced']:,.0f} < ${week_data['aggressive']:,.0f}]")
             report.append(f"Products Due: {len(week_products)}\n")
             
             # Sort products within this week by priority score
-            products = sorted(week_products, key=lambda x: x['priority_score'])
+            products = sorted(
+                zip(week_products, week_data['targets']),
+                key=lambda x: x[0]['priority_score']
+            )
             
             # Process all products for this week
-            for j, opp in enumerate(products):
+            for j, (opp, targets) in enumerate(products):
                 try:
-                    # Debug: Check for missing Bollinger Bands data before processing
-                    if 'bb_upper' not in opp or 'bb_lower' not in opp or 'bb_middle' not in opp:
-                        print(f"Debug: Missing BB data in product formatting for {opp.get('product', 'unknown')}")
-                        print(f"  Available keys: {list(opp.keys())}")
-                        print(f"  Has bb_upper: {'bb_upper' in opp}")
-                        print(f"  Has bb_lower: {'bb_lower' in opp}")
-                        print(f"  Has bb_middle: {'bb_middle' in opp}")
-                        print(f"  Full opportunity dict: {opp}")
-                        import traceback
-                        traceback.print_exc()
+                    if targets is None:
                         report.append(f"\nError: Missing Bollinger Bands data for {opp.get('product', 'unknown')}\n")
                         continue
                     
                     spectrum = create_bb_spectrum(opp['position_in_band'])
-                    next_order = datetime.now() + timedelta(days=opp['order_interval'])
+                    next_order = now + timedelta(days=opp['order_interval'])
                     
                     # Add a blank line between products (but not before the first one)
                     if j > 0:
@@ -3833,7 +3931,7 @@ def format_opportunity_report(opportunities, account_analysis=None):
                     # Format the product entry with indentation for hierarchy
                     report.append(f"  {opp['product']}")
                     report.append(f"     Priority: {opp['contribution_rank']}")
-                    report.append(f"     Next Order Due: {next_order.strftime('%Y.%m.%d')}")
+                    report.append(f"     Next Order Due: {format_report_date(next_order)}")
                     report.append(f"     Current Position:")
                     report.append(f"     {spectrum}")
                     report.append(f"     Floor -------- Average -------- Ceiling")
@@ -3841,16 +3939,8 @@ def format_opportunity_report(opportunities, account_analysis=None):
                     # Add order recommendations with value projections
                     report.append("     Order Recommendations:")
                     
-                    # Calculate quantities and values for each level
-                    # Target the correct percentile levels:
-                    # Conservative = 50th percentile (bb_middle)
-                    # Balanced = 70th percentile (between middle and upper)
-                    # Aggressive = 100th percentile (bb_upper)
-                    bb_70th = opp['bb_lower'] + (opp['bb_upper'] - opp['bb_lower']) * 0.7
-                    
-                    cons_qty = calculate_target_quantity(opp, opp['bb_middle'])
-                    bal_qty = calculate_target_quantity(opp, bb_70th)
-                    agg_qty = calculate_target_quantity(opp, opp['bb_upper'])
+                    # Quantities and values for each level
+                    cons_qty, bal_qty, agg_qty = targets
                     
                     cons_value = cons_qty * opp['unit_price']
                     bal_value = bal_qty * opp['unit_price']
@@ -3933,20 +4023,20 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     print(f"Retrieved {len(orders)} orders for account")
     account_df = create_ohlcv_from_orders(orders, resolution=resolution, ma_window=ma_window)
     
+    # start_date as a Timestamp matching an index timezone (None for a naive index),
+    # built once per timezone and shared by the account and every product
+    start_timestamps = {}
+    def start_timestamp(tz):
+        if tz not in start_timestamps:
+            start_timestamps[tz] = pd.Timestamp(start_date).tz_localize(tz)
+        return start_timestamps[tz]
+    
     # Filter the account_df to only include dates after the actual analysis start date
     if not account_df.empty:
-        # Convert start_date to match the timezone of the DataFrame index
-        # First check if the index has a timezone
-        if account_df.index.tz is not None:
-            # Convert start_date to a timezone-aware datetime with the same timezone
-            start_date_tz = pd.Timestamp(start_date).tz_localize(account_df.index.tz)
-        else:
-            # If index is timezone-naive, use naive start_date
-            start_date_tz = pd.Timestamp(start_date).tz_localize(None)
-            
-        # Now filter with matching timezone types
-        analysis_mask = account_df.index >= start_date_tz
-        analysis_account_df = account_df[analysis_mask].copy()
+        # Convert start_date to match the timezone of the DataFrame index, then
+        # slice the (sorted) index from there
+        start_date_tz = start_timestamp(account_df.index.tz)
+        analysis_account_df = account_df.loc[start_date_tz:].copy()
         
         # Only calculate indicators on the analysis period data
         analysis_account_df = calculate_indicators(analysis_account_df, MA_length=18)
@@ -3954,8 +4044,9 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     
     # Check if account_df has the required columns before creating colors
     if not account_df.empty and all(col in account_df.columns for col in ['open', 'close']):
-        colors['Account Overview'] = ['red' if row['open'] > row['close'] else 'green' 
-                                    for i, row in account_df.iterrows()]
+        colors['Account Overview'] = np.where(
+            account_df['open'].to_numpy() > account_df['close'].to_numpy(), 'red', 'green'
+        ).tolist()
     else:
         # Provide default colors if OHLC data is missing
         colors['Account Overview'] = ['green'] * len(account_df) if not account_df.empty else []
@@ -3969,32 +4060,44 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     # Get current pricebook prices for all products
     pricebook_prices = get_pricebook_prices(list(products.keys()))
     
-    # Filter and create product analyses
+    # Flatten and split order items by product once so each product build gets its own frame
+    product_frames = index_order_products(order_products)
+    
+    # Create product OHLCV with the same ma_window as account level, trimmed to the
+    # analysis period and with indicators applied; products are independent, so
+    # build them on a small pool and consume in product order
+    def build_product_analysis(product_id):
+        df = create_product_ohlcv(product_frames.get(product_id), product_id,
+                                  resolution, ma_window, pricebook_prices)
+        if df is None or df.empty:
+            return None
+        
+        # Filter to only include dates after the actual analysis start date
+        # Use the same timezone handling as above
+        analysis_df = df.loc[start_timestamp(df.index.tz):].copy()
+        
+        if not analysis_df.empty:
+            analysis_df = calculate_indicators(analysis_df, MA_length=18)
+        return analysis_df
+    
+    with ThreadPoolExecutor(max_workers=PRODUCT_OHLCV_WORKERS) as executor:
+        product_analyses = dict(zip(products, executor.map(build_product_analysis, products)))
+    
+    # Collect product analyses
     for product_id, product_name in products.items():
         print(f"Processing product: {product_name}")
         
-        # Create product OHLCV with the same ma_window as account level
-        df = create_product_ohlcv(order_products, product_id, resolution, ma_window, pricebook_prices)
-        if df is not None and not df.empty:
-            # Filter to only include dates after the actual analysis start date
-            # Use the same timezone handling as above
-            if df.index.tz is not None:
-                start_date_tz = pd.Timestamp(start_date).tz_localize(df.index.tz)
-            else:
-                start_date_tz = pd.Timestamp(start_date).tz_localize(None)
-            
-            analysis_mask = df.index >= start_date_tz
-            analysis_df = df[analysis_mask].copy()
-            
+        analysis_df = product_analyses[product_id]
+        if analysis_df is not None:
             if not analysis_df.empty:
                 print(f"  - {product_name}: {len(analysis_df)} data points")
-                analysis_df = calculate_indicators(analysis_df, MA_length=18)
                 analyses[product_name] = analysis_df  # Store the analysis
                 
                 # Check if df has the required columns before creating colors
                 if all(col in analysis_df.columns for col in ['open', 'close']):
-                    colors[product_name] = ['red' if row['open'] > row['close'] else 'green' 
-                                          for i, row in analysis_df.iterrows()]
+                    colors[product_name] = np.where(
+                        analysis_df['open'].to_numpy() > analysis_df['close'].to_numpy(), 'red', 'green'
+                    ).tolist()
                 else:
                     # Provide default colors if OHLC data is missing
                     colors[product_name] = ['green'] * len(analysis_df)
@@ -4003,13 +4106,6 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         else:
             print(f"  - {product_name}: No valid OHLCV data")
     
-    # Create a common date range for all products
-    all_dates = set()
-    for product_name, df in analyses.items():
-        if df is not None and not df.empty:
-            all_dates.update(df.index)
-    all_dates = sorted(all_dates)
-
     # Debug: Print first and last dates for each product
     print("\nProduct date ranges:")
     for product_name, df in analyses.items():
@@ -4018,12 +4114,8 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
 
     # Define analysis_start_date - make sure account_df is valid before using it
     if not account_df.empty:
-        if account_df.index.tz is not None:
-            # If the account dataframe has timezone-aware index, match that
-            analysis_start_date = pd.Timestamp(start_date).tz_localize(account_df.index.tz)
-        else:
-            # Otherwise use timezone-naive date
-            analysis_start_date = pd.Timestamp(start_date).tz_localize(None)
+        # Match the account dataframe's timezone (or lack of one)
+        analysis_start_date = start_timestamp(account_df.index.tz)
     else:
         # Fallback if account_df is empty
         analysis_start_date = pd.Timestamp(start_date)
@@ -4063,16 +4155,12 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     ohlc_min = float('inf')
     ohlc_max = float('-inf')
     
-    # Find min and max values across all visible OHLC traces
-    for name, df in analyses.items():
-        if df is None or df.empty:
-            continue
-            
-        if all(col in df.columns for col in ['low', 'high']):
-            # Only consider Account Overview by default (since it's the only one visible initially)
-            if name == 'Account Overview':
-                ohlc_min = min(ohlc_min, df['low'].min())
-                ohlc_max = max(ohlc_max, df['high'].max())
+    # Find min and max values across visible OHLC traces - only Account Overview
+    # is visible initially, so there is no need to walk the product analyses
+    overview_df = analyses.get('Account Overview')
+    if overview_df is not None and not overview_df.empty and all(col in overview_df.columns for col in ['low', 'high']):
+        ohlc_min = min(ohlc_min, overview_df['low'].min())
+        ohlc_max = max(ohlc_max, overview_df['high'].max())
     
     # Add buffer (10% on top, 5% on bottom)
     if ohlc_min != float('inf') and ohlc_max != float('-inf'):
@@ -4087,18 +4175,30 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             row=1, col=1
         )
     
+    # Each analysis' position in analyses picks its color, for both its OHLC
+    # traces and its contribution trace
+    analysis_positions = {name: position for position, name in enumerate(analyses)}
+    
+    # Indices of each analysis' traces in fig.data, recorded as they are added
+    trace_groups = {}
+    
     # STEP 1: ADD REGULAR ANALYSIS TRACES FIRST
     # Add the regular analysis traces before contribution traces
     for name, df in analyses.items():
         if df is None or df.empty:
             # print(f"Warning: No data for {name}, skipping visualization")
             continue
+        
+        first_trace_idx = len(fig.data)
+        
+        # Column lookups below go against one set per analysis
+        columns = set(df.columns)
             
         # Set initial visibility - only Account Overview visible by default
         is_visible = name == 'Account Overview'
         
         # Generate a unique color for this analysis
-        color_idx = list(analyses.keys()).index(name) % len(analysis_colors)
+        color_idx = analysis_positions[name] % len(analysis_colors)
         base_color = analysis_colors[color_idx]
         
         # Parse the RGB values from the color string and make darker version (50% darker)
@@ -4111,8 +4211,8 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             darker_color = 'rgba(100, 100, 100, 1)'
         
         # OHLC chart - only add if all required columns exist and we have sufficient data
-        if all(col in df.columns for col in ['open', 'high', 'low', 'close']):
-            if 'insufficient_data' in df.columns and df['insufficient_data'].any():
+        if {'open', 'high', 'low', 'close'} <= columns:
+            if 'insufficient_data' in columns and df['insufficient_data'].any():
                 # Add a text annotation instead of the chart
                 fig.add_annotation(
                     x=df.index[len(df.index)//2],  # Center of x-axis
@@ -4146,37 +4246,45 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
                 )
         
         # Bollinger Bands with matching colors - only add if they exist
-        for band, label in [('bb_upper', 'Upper'), ('bb_middle', 'Middle'), ('bb_lower', 'Lower')]:
-            if band in df.columns and not df[band].isna().all():  # Check if column exists AND has valid data
-                fig.add_trace(
-                    go.Scatter(
-                        x=df.index,
-                        y=df[band],
-                        name=f"{name} BB {label}",
-                        line=dict(
-                            color=base_color,
-                            width=1,
-                            dash='dash'
-                        ),
-                        opacity=0.3,
-                        visible=is_visible
+        bands = [
+            band for band in ['bb_upper', 'bb_middle', 'bb_lower']
+            if band in columns and df[band].notna().any()  # Check if column exists AND has valid data
+        ]
+        if bands:
+            # Draw all bands as one trace, one segment per band separated by a gap
+            band_x, band_y = [], []
+            for band in bands:
+                if band_x:
+                    band_x.append(None)
+                    band_y.append([np.nan])
+                band_x.extend(df.index)
+                band_y.append(df[band].to_numpy(dtype=np.float64))
+            
+            fig.add_trace(
+                go.Scatter(
+                    x=band_x,
+                    y=np.concatenate(band_y),
+                    name=f"{name} BB",
+                    line=dict(
+                        color=base_color,
+                        width=1,
+                        dash='dash'
                     ),
-                    row=1, col=1
-                )
+                    opacity=0.3,
+                    connectgaps=False,
+                    visible=is_visible
+                ),
+                row=1, col=1
+            )
         
         # Volume with color-coded bars - only add if volume column exists
-        if 'volume' in df.columns:
+        if 'volume' in columns:
             # Check if we have OHLC data for coloring
-            if all(col in df.columns for col in ['open', 'close']):
+            if {'open', 'close'} <= columns:
                 # Use OHLC data for coloring
-                bar_colors = [
-                    base_color if close >= open else darker_color
-                    for open, close in zip(df['open'], df['close'])
-                ]
-                bar_opacities = [
-                    0.6 if close >= open else 0.8
-                    for open, close in zip(df['open'], df['close'])
-                ]
+                up_bars = df['close'].to_numpy() >= df['open'].to_numpy()
+                bar_colors = np.where(up_bars, base_color, darker_color).tolist()
+                bar_opacities = np.where(up_bars, 0.6, 0.8).tolist()
             else:
                 # Use default coloring if OHLC data is missing
                 bar_colors = [base_color] * len(df)
@@ -4197,7 +4305,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         )
         
         # Add volume SMA if it exists
-        if 'volume_sma' in df.columns:
+        if 'volume_sma' in columns:
             fig.add_trace(
                 go.Scatter(
                     x=df.index,
@@ -4214,7 +4322,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             )
         
         # RSI with matching colors - only add if it exists
-        if 'rsi' in df.columns:
+        if 'rsi' in columns:
             fig.add_trace(
                 go.Scatter(
                     x=df.index,
@@ -4227,7 +4335,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             )
             
             # Add RSI MA if it exists
-            if 'rsi_ma' in df.columns:
+            if 'rsi_ma' in columns:
                 fig.add_trace(
                     go.Scatter(
                         x=df.index,
@@ -4244,17 +4352,12 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
                 )
         
         # MACD lines and histogram - only add if they exist
-        if all(col in df.columns for col in ['macd', 'macd_signal', 'macd_hist']):
+        if {'macd', 'macd_signal', 'macd_hist'} <= columns:
             # First add the histogram
             # Prepare colors for MACD histogram
-            macd_colors = [
-                base_color if val >= 0 else darker_color
-                for val in df['macd_hist']
-            ]
-            macd_opacities = [
-                0.6 if val >= 0 else 0.8
-                for val in df['macd_hist']
-            ]
+            rising_hist = df['macd_hist'].to_numpy() >= 0
+            macd_colors = np.where(rising_hist, base_color, darker_color).tolist()
+            macd_opacities = np.where(rising_hist, 0.6, 0.8).tolist()
             
             fig.add_trace(
                 go.Bar(
@@ -4300,6 +4403,9 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         else:
             # Log that we're skipping this product due to missing OHLC data
             print(f"Skipping visualization for {name} - missing OHLC data")
+        
+        if len(fig.data) > first_trace_idx:
+            trace_groups[name] = list(range(first_trace_idx, len(fig.data)))
 
     # STEP 2: ADD PRODUCT CONTRIBUTION TRACES SECOND
     # First collect and sort all product contributions before adding them
@@ -4312,13 +4418,7 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             print(f"  {product_name}: {len(df)} data points")
 
     # Get the resolution frequency
-    freq_map = {
-        '3D': '3D',
-        '1W': 'W',
-        '2W': '2W',
-        '1M': 'M'
-    }
-    resample_freq = freq_map[resolution]
+    resample_freq = RESOLUTION_FREQ[resolution]
     print(f"Using resolution frequency: {resample_freq} for product contributions")
 
     # Step 1: Define consistent date boundaries for the 3-day windows
@@ -4367,21 +4467,16 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
     )
 
     # Step 3: Calculate total value for each aligned time period
-    date_totals = {}
-    for date in consolidated_product_data:
-        total = sum(consolidated_product_data[date].values())
-        if total > 0:  # Skip dates with no data
-            date_totals[date] = total
+    date_totals = consolidated_product_data.sum(axis=1)
+    date_totals = date_totals[date_totals > 0]  # Skip dates with no data
 
     # Print debug information
     print(f"Created consolidated values for {len(date_totals)} time periods")
-    print(f"Number of products with data: {len(set().union(*[set(data.keys()) for data in consolidated_product_data.values()]))}")
+    print(f"Number of products with data: {len(consolidated_product_data.columns)}")
 
     # Step 4: Create contribution traces for each product aligned to the grid
     # We need to collect ALL products that appear anywhere in our data
-    all_product_names = set()
-    for date_data in consolidated_product_data.values():
-        all_product_names.update(date_data.keys())
+    all_product_names = consolidated_product_data.columns
 
     # Create a mapping of product names to their colors from the OHLC charts
     product_color_map = {}
@@ -4390,20 +4485,16 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             continue
         
         # Calculate the color index the same way we did for OHLC
-        color_idx = list(analyses.keys()).index(name) % len(analysis_colors)
+        color_idx = analysis_positions[name] % len(analysis_colors)
         product_color_map[name] = analysis_colors[color_idx]
         print(f"Assigned color to {name}: {analysis_colors[color_idx]}")
 
     # Now create traces for each product using our consolidated data
     for i, product_name in enumerate(all_product_names):
-        dates = []
-        values = []
-        
         # Collect all dates where this product has data
-        for date in sorted(consolidated_product_data.keys()):
-            if product_name in consolidated_product_data[date]:
-                dates.append(date)
-                values.append(consolidated_product_data[date][product_name])
+        product_values = consolidated_product_data[product_name].dropna()
+        dates = list(product_values.index)
+        values = product_values.tolist()
         
         if not dates:
             print(f"  Warning: No consolidated dates for {product_name}")
@@ -4470,48 +4561,8 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         contribution_trace_indices.append(trace_idx)  # Store the index
         print(f"  Added contribution trace for {product_name} at index {trace_idx} with color {color}")
 
-    # STEP 3: CREATE TRACE GROUPS
-    # Create a mapping of traces to their exact analysis name
-    trace_groups = {}
-
-    # First, identify all contribution traces
-    contribution_trace_indices = []
-    for i, trace in enumerate(fig.data):
-        if "$ Contribution" in trace.name:
-            contribution_trace_indices.append(i)
-
-    # Then identify all non-contribution traces and group them
-    for i, trace in enumerate(fig.data):
-        # Skip contribution traces - they're handled separately
-        if i in contribution_trace_indices:
-            continue
-            
-        # Extract the full product name from the trace name
-        trace_parts = trace.name.split()
-        
-        # For traces like "MegaMucosa OHLC" or "MegaMucosa Stick Packs OHLC"
-        # We need to determine where the product name ends and the chart type begins
-        chart_types = ["OHLC", "BB", "Volume", "RSI", "MACD", "Signal", "Hist", "MA", "Upper", "Middle", "Lower"]
-        
-        # Find where the chart type starts in the trace name
-        chart_type_index = None
-        for j, part in enumerate(trace_parts):
-            if part in chart_types:
-                chart_type_index = j
-                break
-        
-        # If we found a chart type, everything before it is the product name
-        if chart_type_index is not None:
-            product_name = " ".join(trace_parts[:chart_type_index])
-        else:
-            # Fallback - use the first part as the product name
-            product_name = trace_parts[0]
-        
-        # Add to trace groups
-        if product_name not in trace_groups:
-            trace_groups[product_name] = []
-        trace_groups[product_name].append(i)
-
+    # STEP 3: TRACE GROUPS
+    # trace_groups and contribution_trace_indices were filled in as traces were added
     print(f"\nTrace groups created: {list(trace_groups.keys())}")
     for group, indices in trace_groups.items():
         print(f"  {group}: {len(indices)} traces")
@@ -4595,10 +4646,13 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
             method="update"
         ))
 
+    # Visibility mask shared by every remaining button: product contributions
+    # only; each button copies it and switches on its own traces
+    contribution_visible = np.zeros(len(fig.data), dtype=bool)
+    contribution_visible[contribution_trace_indices] = True
+
     # 2. Clear All button - hides all traces except product contributions
-    clear_visible = [False] * len(fig.data)
-    for i in contribution_trace_indices:
-        clear_visible[i] = True
+    clear_visible = contribution_visible.tolist()
         
     buttons.append(dict(
         args=[{"visible": clear_visible}],
@@ -4608,15 +4662,10 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
 
     # 3. Account Overview button - shows Account Overview traces + ALL product contributions
     if "Account Overview" in trace_groups:
-        account_visible = [False] * len(fig.data)
-        
-        # Show Account Overview traces
-        for i in trace_groups["Account Overview"]:
-            account_visible[i] = True
-        
-        # Always show ALL product contributions
-        for i in contribution_trace_indices:
-            account_visible[i] = True
+        # Show Account Overview traces, and always show ALL product contributions
+        account_visible = contribution_visible.copy()
+        account_visible[trace_groups["Account Overview"]] = True
+        account_visible = account_visible.tolist()
         
         # Use pre-calculated y-axis range for Account Overview
         if 'Account Overview' in y_axis_ranges:
@@ -4654,16 +4703,10 @@ def create_combined_analysis(account_id, start_date, end_date, resolution='3D',
         indices = trace_groups[product_name]
         print(f"  {product_name}: {len(indices)} traces")
         
-        # Create visibility array for this product
-        product_visible = [False] * len(fig.data)
-        
-        # Show this product's traces
-        for i in indices:
-            product_visible[i] = True
-            
-        # Always show ALL product contributions
-        for i in contribution_trace_indices:
-            product_visible[i] = True
+        # Show this product's traces, and always show ALL product contributions
+        product_visible = contribution_visible.copy()
+        product_visible[indices] = True
+        product_visible = product_visible.tolist()
             
         # Set up the layout updates
         layout_updates = {}
@@ -4950,21 +4993,12 @@ def analyze_product_opportunities(analyses, consolidated_product_data, account_a
     ignored_products = ["Mouth Cleaner", "Mouth Freshener"]
     
     # Calculate contribution metrics for each product
-    product_contributions = {}
-    for date_data in consolidated_product_data.values():
-        for product, value in date_data.items():
-            # Skip products that contain any of the ignored terms
-            if any(ignored_term in product for ignored_term in ignored_products):
-                continue
-                
-            if product not in product_contributions:
-                product_contributions[product] = []
-            product_contributions[product].append(value)
-    
-    # Calculate average contribution for each product
+    # Calculate average contribution for each product over the periods it has data
     avg_contributions = {
-        product: sum(values) / len(values)
-        for product, values in product_contributions.items()
+        product: values.mean()
+        for product, values in consolidated_product_data.items()
+        # Skip products that contain any of the ignored terms
+        if not any(ignored_term in product for ignored_term in ignored_products)
     }
     
     # Filter out products with very low contribution (e.g., less than 1% of max contribution)
@@ -5093,6 +5127,28 @@ def calculate_target_quantity(opp, target_value):
     # Round to nearest whole unit
     return max(0, round(quantity))
 
+def calculate_opportunity_targets(opp):
+    """
+    Calculate the conservative/balanced/aggressive order quantities for an opportunity
+    Returns None (after logging what is missing) when Bollinger Bands data is absent
+    """
+    missing = [field for field in OPPORTUNITY_BB_FIELDS if field not in opp]
+    if missing:
+        print(f"Debug: Missing BB data for {opp.get('product', 'unknown')}: {missing}")
+        return None
+    
+    # Target the correct percentile levels:
+    # Conservative = 50th percentile (bb_middle)
+    # Balanced = 70th percentile (between middle and upper)
+    # Aggressive = 100th percentile (bb_upper)
+    bb_70th = opp['bb_lower'] + (opp['bb_upper'] - opp['bb_lower']) * 0.7
+    
+    return (
+        calculate_target_quantity(opp, opp['bb_middle']),
+        calculate_target_quantity(opp, bb_70th),
+        calculate_target_quantity(opp, opp['bb_upper'])
+    )
+
 def format_account_overview(account_analysis, opportunities):
     """Generate enhanced account overview section with intuitive metrics"""
     
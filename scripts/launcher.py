@@ -11,11 +11,9 @@ import webbrowser
 import time
 from pathlib import Path
 
-# Print header immediately so users see something right away
-print("=" * 70)
-print("Quantitative Sales - Launcher")
-print("=" * 70)
-print()
+# Print header immediately so users see something right away (one write, then flush)
+sys.stdout.write("=" * 70 + "\nQuantitative Sales - Launcher\n" + "=" * 70 + "\n\n")
+sys.stdout.flush()
 
 # Handle PyInstaller one-file executable
 # When running from PyInstaller, sys._MEIPASS contains the path to extracted files
@@ -43,10 +41,8 @@ def launch_app():
         print(f"Contents of app_dir: {list(app_dir.iterdir()) if app_dir.exists() else 'Directory not found'}")
         return False
     
-    print("=" * 70)
-    print("Quantitative Sales - Starting Application")
-    print("=" * 70)
-    print()
+    sys.stdout.write("=" * 70 + "\nQuantitative Sales - Starting Application\n" + "=" * 70 + "\n\n")
+    sys.stdout.flush()
     
     # Launch the app
     try:
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import app
+
+
+class FindOutputFilesTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.dir = Path(self._tmp.name)
+        self._orig_app_dir = app.app_dir
+        app.app_dir = self.dir
+        self.addCleanup(setattr, app, 'app_dir', self._orig_app_dir)
+
+    def test_prefix_match_picks_newest(self):
+        old = self.dir / 'Acme_opportunity_report_a.txt'
+        new = self.dir / 'Acme_opportunity_report_b.txt'
+        old.write_text('old')
+        new.write_text('new')
+        os.utime(old, (1, 1))
+        self.assertEqual(app.find_output_files('Acme')['text'], new)
+
+        # Overwriting a file leaves the directory mtime alone; it must still win
+        old.write_text('rewritten')
+        self.assertEqual(app.find_output_files('Acme')['text'], old)
+
+    def test_fallback_search_when_no_prefix_match(self):
+        (self.dir / 'notes_Acme.txt').write_text('report')
+        (self.dir / 'Acme_chart.html').write_text('<html></html>')
+        (self.dir / 'Other.txt').write_text('unrelated')
+
+        output_files = app.find_output_files('Acme')
+
+        self.assertEqual(output_files['text'], self.dir / 'notes_Acme.txt')
+        self.assertEqual(output_files['html'], self.dir / 'Acme_chart.html')
+
+
+if __name__ == '__main__':
+    unittest.main()